@@ -0,0 +1,59 @@
+import os
+import threading
+import httpx
+from groq import Groq  # Ensure groq is installed and configured correctly
+
+# Connection pool and request settings shared by every API client in the process.
+MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("API_MAX_KEEPALIVE_CONNECTIONS", "16"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("API_KEEPALIVE_EXPIRY_SECONDS", "120"))
+TIMEOUT_SECONDS = float(os.getenv("API_TIMEOUT_SECONDS", "60"))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("API_CONNECT_TIMEOUT_SECONDS", "10"))
+# Retries are handled by rate_limiter's scheduler, which needs to see 429s to adapt.
+MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "0"))
+
+# Clients live at module level, so they survive Streamlit reruns (which re-execute the app
+# script but not imported modules) and are shared by all sessions and worker threads.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _http_client():
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+    )
+
+def get_groq_client(api_key=None):
+    """
+    Returns the process-wide Groq client for api_key (GROQ_API_KEY when None), creating it on
+    first use with a pooled keep-alive HTTP client so connections and TLS sessions are reused.
+    """
+    key = ("groq", api_key)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = Groq(
+                api_key=api_key,
+                http_client=_http_client(),
+                timeout=TIMEOUT_SECONDS,
+                max_retries=MAX_RETRIES,
+            )
+        return _clients[key]
+
+def get_openai_client(api_key=None):
+    """Returns the process-wide OpenAI client for api_key, pooled the same way as the Groq client."""
+    from openai import OpenAI
+
+    key = ("openai", api_key)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = OpenAI(
+                api_key=api_key,
+                http_client=_http_client(),
+                timeout=TIMEOUT_SECONDS,
+                max_retries=MAX_RETRIES,
+            )
+        return _clients[key]
@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import threading
+
+try:
+    import fcntl  # Cross-process locking; unavailable on Windows.
+except ImportError:
+    fcntl = None
+
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "audio_cache")
+# Total size the cache may occupy before least recently used files are evicted.
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+def _audio_path(video_id, cache_dir):
+    return os.path.join(cache_dir, f"audio_{video_id}.mp3")
+
+def _meta_path(video_id, cache_dir):
+    return os.path.join(cache_dir, f"audio_{video_id}.json")
+
+class _VideoLock:
+    """
+    Serializes work on one video ID across threads (Streamlit sessions) and processes,
+    so two sessions requesting the same video download it only once.
+    """
+
+    def __init__(self, video_id, cache_dir):
+        with _thread_locks_guard:
+            self._thread_lock = _thread_locks.setdefault((cache_dir, video_id), threading.Lock())
+        self._lock_path = os.path.join(cache_dir, f"audio_{video_id}.lock")
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            self._file = open(self._lock_path, "w")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+def _is_complete(video_id, cache_dir):
+    """A cached file is valid only if its metadata was written and the recorded size matches."""
+    audio_path = _audio_path(video_id, cache_dir)
+    try:
+        with open(_meta_path(video_id, cache_dir)) as f:
+            meta = json.load(f)
+        return os.path.getsize(audio_path) == meta.get("size") and meta["size"] > 0
+    except (OSError, ValueError, KeyError):
+        return False
+
+def _discard(video_id, cache_dir):
+    for path in (_audio_path(video_id, cache_dir), _meta_path(video_id, cache_dir)):
+        if os.path.exists(path):
+            os.remove(path)
+
+def get_cached_audio(video_id, download_fn, cache_dir=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES):
+    """
+    Returns (path, hit) for the audio of video_id, calling download_fn(output_path) only
+    when there is no complete cached copy. Downloads go to a temporary name and are moved
+    into place once finished, so an interrupted download is never served as a hit.
+    download_fn may return a dict of extra metadata to record next to the file.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    audio_path = _audio_path(video_id, cache_dir)
+    with _VideoLock(video_id, cache_dir):
+        if _is_complete(video_id, cache_dir):
+            os.utime(audio_path)  # Mark as recently used for LRU eviction.
+            return audio_path, True
+
+        # Anything left over is a partial or corrupt download.
+        _discard(video_id, cache_dir)
+        temp_path = os.path.join(cache_dir, f"audio_{video_id}.download.mp3")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        try:
+            extra_meta = download_fn(temp_path) or {}
+            if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+                raise RuntimeError(f"Download for video '{video_id}' produced no audio.")
+            os.replace(temp_path, audio_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        with open(_meta_path(video_id, cache_dir), "w") as f:
+            json.dump(dict(extra_meta, video_id=video_id, size=os.path.getsize(audio_path), downloaded_at=time.time()), f)
+
+    evict_audio_cache(cache_dir, max_bytes, keep=audio_path)
+    return audio_path, False
+
+def get_audio_metadata(audio_path):
+    """Returns the metadata recorded next to a cached audio file, or an empty dict."""
+    try:
+        with open(audio_path[:-len(".mp3")] + ".json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def evict_audio_cache(cache_dir=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES, keep=None):
+    """Deletes least recently used audio files until the cache fits within max_bytes."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not (name.startswith("audio_") and name.endswith(".mp3")) or name.endswith(".download.mp3"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path, name[len("audio_"):-len(".mp3")]))
+
+    total = sum(size for _, size, _, _ in entries)
+    for _, size, path, video_id in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        with _VideoLock(video_id, cache_dir):
+            _discard(video_id, cache_dir)
+        total -= size
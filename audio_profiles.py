@@ -0,0 +1,39 @@
+import os
+import shutil
+import subprocess
+
+# Extraction profiles for downloaded audio. Whisper resamples everything to 16 kHz mono,
+# so the speech profile throws away nothing the model would use while shrinking uploads.
+AUDIO_PROFILES = {
+    "speech": {"codec": "libmp3lame", "channels": 1, "sample_rate": 16000, "bitrate": "32k"},
+    "original": None,  # Keep the best available audio stream untouched.
+}
+DEFAULT_AUDIO_PROFILE = os.getenv("AUDIO_PROFILE", "speech")
+
+def convert_audio(source_path, output_path, profile=DEFAULT_AUDIO_PROFILE):
+    """
+    Re-encodes source_path into output_path according to the named profile with ffmpeg.
+    Returns metadata describing the profile used and the bytes saved versus the source.
+    Falls back to the original audio when the profile is "original" or ffmpeg is missing.
+    """
+    settings = AUDIO_PROFILES[profile]
+    source_bytes = os.path.getsize(source_path)
+    if settings is None or shutil.which("ffmpeg") is None:
+        shutil.move(source_path, output_path)
+        profile = "original"
+    else:
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-i", source_path, "-vn",
+             "-ac", str(settings["channels"]), "-ar", str(settings["sample_rate"]),
+             "-c:a", settings["codec"], "-b:a", settings["bitrate"], "-f", "mp3", output_path],
+            check=True
+        )
+        os.remove(source_path)
+    output_bytes = os.path.getsize(output_path)
+    return {
+        "profile": profile,
+        "settings": AUDIO_PROFILES[profile],
+        "source_bytes": source_bytes,
+        "bytes": output_bytes,
+        "bytes_saved": source_bytes - output_bytes,
+    }
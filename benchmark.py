@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the transcribe and translate stages against the local mock server.
+Reports end-to-end wall time, p50/p95 per-request latency and requests per second for each
+stage and translation mode, without Groq credentials or network access.
+
+Usage: python benchmark.py [--segments 200] [--latency 0.2] [--jitter 0.05] [--error-rate 0.0] [--rate-limit-rpm N]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from metrics import percentile
+from mock_inference_server import MockInferenceServer
+
+TRANSLATION_MODES = ["sequential", "parallel", "batched"]
+
+class LatencyRecorder:
+    """Wraps a function so every call's latency and failure is recorded (thread-safe)."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - start)
+
+def summarize(stage, mode, wall_time, recorders):
+    latencies = [latency for recorder in recorders for latency in recorder.latencies]
+    return {
+        "stage": stage,
+        "mode": mode,
+        "requests": len(latencies),
+        "errors": sum(recorder.errors for recorder in recorders),
+        "wall_s": round(wall_time, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "requests_per_s": round(len(latencies) / wall_time, 2) if wall_time > 0 else 0.0,
+    }
+
+def print_table(rows):
+    columns = ["stage", "mode", "requests", "errors", "wall_s", "p50_ms", "p95_ms", "requests_per_s"]
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+
+def run_benchmark(args, work_dir):
+    # The pipeline modules read these when they create their clients.
+    os.environ["GROQ_BASE_URL"] = args.base_url
+    os.environ.setdefault("GROQ_API_KEY", "mock-key")
+    # The scheduler's rate limits are off unless --scheduler-rpm is given, and its adaptive
+    # concurrency is pinned to --workers instead of ramping up from its initial limit, so by
+    # default the numbers measure the pipeline at the requested concurrency.
+    os.environ["RATE_LIMITS"] = json.dumps({
+        model: {"rpm": args.scheduler_rpm, "tpm": None}
+        for model in ("llama-3.3-70b-versatile", "whisper-large-v3")
+    })
+    os.environ["RATE_LIMIT_INITIAL_CONCURRENCY"] = str(args.workers)
+    os.environ["RATE_LIMIT_MAX_CONCURRENCY"] = str(args.workers)
+    from translation_cache import configure_translation_cache
+    from translation_pipeline import translate_segments, translate_segments_batched
+    import translation_pipeline
+
+    audio_path = os.path.join(work_dir, "benchmark_audio.mp3")
+    with open(audio_path, "wb") as f:
+        f.write(os.urandom(args.audio_bytes))
+
+    rows = []
+    transcribe = LatencyRecorder(translation_pipeline.transcribe_audio)
+    start = time.perf_counter()
+    segments = []
+    for _ in range(args.transcriptions):
+        try:
+            segments = transcribe(audio_path).get("segments", [])
+        except Exception:
+            pass
+    rows.append(summarize("transcribe", "single", time.perf_counter() - start, [transcribe]))
+
+    for mode in args.modes:
+        # Every mode starts from a cold cache so the numbers measure requests, not lookups.
+        configure_translation_cache(os.path.join(work_dir, f"cache_{mode}.sqlite3"))
+        translate = LatencyRecorder(translation_pipeline.call_chat_translation)
+        recorders = [translate]
+        start = time.perf_counter()
+        if mode == "sequential":
+            for seg in segments:
+                try:
+                    translate(seg.get("text", ""))
+                except Exception:
+                    pass
+        elif mode == "parallel":
+            translate_segments(segments, translate, max_workers=args.workers)
+        else:
+            batch = LatencyRecorder(translation_pipeline.call_batch_translation)
+            recorders.append(batch)
+            translate_segments_batched(segments, translate, batch_fn=batch, max_workers=args.workers)
+        rows.append(summarize("translate", mode, time.perf_counter() - start, recorders))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the translation pipeline against a local mock server.")
+    parser.add_argument("--segments", type=int, default=200, help="Segments returned per transcription.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock mean latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Mock latency jitter in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock probability of an HTTP 500.")
+    parser.add_argument("--rate-limit-rpm", type=int, help="Mock answers HTTP 429 beyond this many requests per minute.")
+    parser.add_argument("--scheduler-rpm", type=int, help="Client-side scheduler limit per model (default unlimited).")
+    parser.add_argument("--transcriptions", type=int, default=3, help="Transcription requests to time.")
+    parser.add_argument("--audio-bytes", type=int, default=1024 * 1024, help="Size of the dummy audio upload.")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrency for parallel and batched modes.")
+    parser.add_argument("--modes", nargs="+", choices=TRANSLATION_MODES, default=TRANSLATION_MODES)
+    parser.add_argument("--base-url", help="Use an already running server instead of starting one.")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    server = None
+    if not args.base_url:
+        server = MockInferenceServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                     segments=args.segments, seed=0, rate_limit_rpm=args.rate_limit_rpm).start()
+        args.base_url = server.base_url
+    try:
+        with tempfile.TemporaryDirectory(prefix="benchmark_") as work_dir:
+            rows = run_benchmark(args, work_dir)
+    finally:
+        if server is not None:
+            server.stop()
+
+    print_table(rows)
+    # Server-side counts include client retries of injected failures.
+    server_requests = dict(server.request_counts) if server is not None else {}
+    if server_requests:
+        print("\nRequests received by the mock server: " +
+              ", ".join(f"{endpoint}={count}" for endpoint, count in sorted(server_requests.items())))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"config": vars(args), "results": rows, "server_requests": server_requests}, f, indent=2)
+
+if __name__ == "__main__":
+    sys.exit(main())
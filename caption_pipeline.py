@@ -0,0 +1,347 @@
+import os
+import json
+import queue
+import time
+import shutil
+import tempfile
+import threading
+from chunked_transcription import extract_chunk, iter_transcribed_chunks, plan_chunks, probe_duration, stitch_chunk
+from translation_pipeline import DEFAULT_LANGUAGE, for_language, translate_segments, translate_segments_multi
+
+CAPTIONS_DIR = os.path.join("static", "captions")
+# Translated segments are published in groups of this size so the first captions appear early.
+PUBLISH_EVERY_SEGMENTS = int(os.getenv("CAPTION_PUBLISH_EVERY_SEGMENTS", "20"))
+# Minimum seconds between captions file writes caused by streamed partial translations.
+PARTIAL_PUBLISH_SECONDS = float(os.getenv("CAPTION_PARTIAL_PUBLISH_SECONDS", "0.25"))
+# Live mode: audio is processed in windows of this length (plus a small overlap) ...
+LIVE_WINDOW_SECONDS = float(os.getenv("LIVE_WINDOW_SECONDS", "30"))
+LIVE_OVERLAP_SECONDS = float(os.getenv("LIVE_OVERLAP_SECONDS", "2"))
+# ... and only windows overlapping this many seconds ahead of the playhead are worked on.
+LIVE_LOOKAHEAD_SECONDS = float(os.getenv("LIVE_LOOKAHEAD_SECONDS", "90"))
+LIVE_MAX_WORKERS = int(os.getenv("LIVE_MAX_WORKERS", "3"))
+# A live run whose player has not reported the playhead for this long is considered abandoned.
+LIVE_IDLE_SECONDS = float(os.getenv("LIVE_IDLE_SECONDS", "300"))
+
+# Captions files are named by a captions ID (a job ID, or a stored result's key) rather than the
+# video ID, so runs of the same video with different languages or options never share a file.
+def captions_path(captions_id):
+    return os.path.join(CAPTIONS_DIR, f"{captions_id}.json")
+
+def captions_url(captions_id):
+    """URL of the captions file relative to the Streamlit app (requires server.enableStaticServing)."""
+    return f"app/static/captions/{captions_id}.json"
+
+def published_segments(segments):
+    """Drops streaming placeholders that have not received any text yet."""
+    return [seg for seg in segments if seg.get("text") or not seg.get("partial")]
+
+def compact_segments(segments):
+    """
+    Packs segments into parallel start/end/text arrays sorted by start time, dropping every
+    other field Whisper returns. This is the payload the player indexes into.
+    While streamed translations are in progress, a "partial" array flags (with 1) the
+    segments whose text is not final yet; placeholders with no text yet are left out.
+    Multi-language runs add a "tracks" object with one text array per language, sharing the
+    same timestamps.
+    """
+    ordered = sorted(published_segments(segments), key=lambda seg: seg.get("start", 0.0))
+    payload = {
+        "starts": [round(seg.get("start", 0.0), 2) for seg in ordered],
+        "ends": [round(seg.get("end", 0.0), 2) for seg in ordered],
+        "texts": [seg.get("text", "") for seg in ordered],
+    }
+    if any(seg.get("partial") for seg in ordered):
+        payload["partial"] = [1 if seg.get("partial") else 0 for seg in ordered]
+    languages = next((list(seg["translations"]) for seg in ordered if seg.get("translations")), None)
+    if languages:
+        payload["tracks"] = {
+            language: [seg.get("translations", {}).get(language, seg.get("text", "")) for seg in ordered]
+            for language in languages
+        }
+    return payload
+
+def translate_group(segments, translate_fn, batch=True, languages=None):
+    """
+    Translates one group of transcribed segments into every language (the first is the primary
+    track). Returned segments carry the primary translation as their text and, when there are
+    several languages, a "translations" dict with each language's text. Failures name their language.
+    """
+    languages = languages or [DEFAULT_LANGUAGE]
+    results = translate_segments_multi(segments, translate_fn, languages, batch=batch)
+    translated, _ = results[languages[0]]
+    if len(languages) > 1:
+        translated = [
+            dict(seg, translations={language: results[language][0][i]["text"] for language in languages})
+            for i, seg in enumerate(translated)
+        ]
+    failures = [dict(f, language=language) for language in languages for f in results[language][1]]
+    return translated, failures
+
+class CaptionPipelineRun:
+    """
+    Thread-safe progress of one transcribe-then-translate run.
+    Translated segments are appended in timeline order as they become ready and mirrored to
+    a JSON captions file that the embedded player polls. With streaming translation, a group's
+    slots are reserved up front and filled in with partial text as tokens arrive; slots without
+    any text yet are not published.
+    """
+
+    def __init__(self, captions_id):
+        self.captions_id = captions_id
+        self.segments = []
+        self.failures = []
+        self.chunks_done = 0
+        self.chunks_total = None
+        self.done = False
+        self.error = None
+        self._lock = threading.Lock()
+        # Serializes captions file writes so an older payload never replaces a newer one.
+        self._write_lock = threading.Lock()
+        self._last_write = 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "segments": published_segments(self.segments),
+                "streaming": [seg["text"] for seg in self.segments if seg.get("partial") and seg.get("text")],
+                "failures": list(self.failures),
+                "chunks_done": self.chunks_done,
+                "chunks_total": self.chunks_total,
+                "done": self.done,
+                "error": self.error,
+            }
+
+    def _publish(self, segments=(), failures=(), chunks_done=None, chunks_total=None, done=False, error=None):
+        with self._lock:
+            offset = len(self.segments)
+            self.segments.extend(segments)
+            self.failures.extend(dict(f, index=f["index"] + offset) for f in failures)
+            if chunks_done is not None:
+                self.chunks_done = chunks_done
+            if chunks_total is not None:
+                self.chunks_total = chunks_total
+            self.done = self.done or done
+            self.error = self.error or error
+        self._write()
+
+    def _reserve(self, segments):
+        """Appends placeholders for segments being streamed and returns the index of the first one."""
+        with self._lock:
+            offset = len(self.segments)
+            self.segments.extend(dict(seg, text="", partial=True) for seg in segments)
+        self._write()
+        return offset
+
+    def _update_partial(self, index, text):
+        with self._lock:
+            self.segments[index] = dict(self.segments[index], text=text)
+        if time.monotonic() - self._last_write >= PARTIAL_PUBLISH_SECONDS:
+            self._write()
+
+    def _finalize(self, offset, segments, failures):
+        """Replaces reserved placeholders with the finished segments."""
+        with self._lock:
+            self.segments[offset:offset + len(segments)] = segments
+            self.failures.extend(dict(f, index=f["index"] + offset) for f in failures)
+        self._write()
+
+    def _write(self):
+        with self._write_lock:
+            with self._lock:
+                payload = dict(compact_segments(self.segments), complete=self.done)
+            write_captions(self.captions_id, payload)
+            self._last_write = time.monotonic()
+
+def write_captions(captions_id, payload):
+    """Atomically replaces the captions file so the player never reads a half-written file."""
+    os.makedirs(CAPTIONS_DIR, exist_ok=True)
+    path = captions_path(captions_id)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+def start_caption_pipeline(captions_id, audio_file, transcribe_fn, translate_fn, batch=True, stream=False,
+                           on_complete=None, languages=None):
+    """
+    Starts a background producer/consumer pipeline and returns its CaptionPipelineRun.
+    The producer transcribes audio chunks concurrently; the consumer translates each group
+    of segments as soon as it arrives and publishes it, so playback can begin long before the
+    whole video is processed.
+    With stream=True, translate_fn is a streaming translator (text, on_partial=None) and each
+    segment's partial translation is published while it is generated; batching is not used.
+    languages lists the caption tracks to produce from the single transcription (see
+    translate_group); streaming produces only the first (primary) language.
+    on_complete, if given, is called with the final snapshot when the run finishes without error.
+    """
+    run = CaptionPipelineRun(captions_id)
+    run._publish()
+    transcribed = queue.Queue()
+
+    def produce():
+        try:
+            for k, total, segments in iter_transcribed_chunks(audio_file, transcribe_fn):
+                transcribed.put((k, total, segments))
+        except Exception as e:
+            transcribed.put(e)
+        transcribed.put(None)
+
+    def consume():
+        while True:
+            item = transcribed.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                run._publish(error=str(item))
+                continue
+            k, total, segments = item
+            run._publish(chunks_total=total)
+            for i in range(0, len(segments), PUBLISH_EVERY_SEGMENTS):
+                group = segments[i:i + PUBLISH_EVERY_SEGMENTS]
+                if stream:
+                    offset = run._reserve(group)
+                    translated, failures = translate_segments(
+                        group, for_language(translate_fn, (languages or [DEFAULT_LANGUAGE])[0]), on_partial=lambda j, text, offset=offset: run._update_partial(offset + j, text)
+                    )
+                    run._finalize(offset, translated, failures)
+                    continue
+                translated, failures = translate_group(group, translate_fn, batch, languages)
+                run._publish(translated, failures)
+            run._publish(chunks_done=k + 1)
+        run._publish(done=True)
+        if on_complete and not run.error:
+            on_complete(run.snapshot())
+
+    threading.Thread(target=produce, daemon=True).start()
+    threading.Thread(target=consume, daemon=True).start()
+    return run
+
+class LiveCaptionRun(CaptionPipelineRun):
+    """
+    Progress of a just-in-time run: windows of audio are transcribed and translated in order of
+    their distance from the player's current time, only up to a lookahead past the playhead.
+    Windows behind the playhead (for example after a forward seek) are captioned once nothing
+    inside the lookahead is pending, so the run still finishes.
+    """
+
+    def __init__(self, captions_id, windows, lookahead_seconds=LIVE_LOOKAHEAD_SECONDS):
+        super().__init__(captions_id)
+        self.windows = windows
+        self.lookahead_seconds = lookahead_seconds
+        self.playhead = 0.0
+        self.playhead_reported_at = time.monotonic()
+        self.chunks_total = len(windows)
+        self._pending = set(range(len(windows)))
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def set_playhead(self, seconds):
+        """Called with the player's current time; a seek immediately re-prioritizes the windows."""
+        with self._condition:
+            self.playhead = max(0.0, float(seconds))
+            self.playhead_reported_at = time.monotonic()
+            self._condition.notify_all()
+
+    def is_idle(self, idle_seconds=LIVE_IDLE_SECONDS):
+        """True when no player has reported the playhead for idle_seconds."""
+        return time.monotonic() - self.playhead_reported_at > idle_seconds
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def _next_window(self):
+        """
+        Blocks until a pending window is eligible and returns it, or None when finished. Windows
+        inside the lookahead go first, nearest the playhead first; then windows already behind
+        the playhead, latest first. Windows past the lookahead wait for the playhead.
+        """
+        with self._condition:
+            while True:
+                if self._stopped or not self._pending:
+                    return None
+                horizon = self.playhead + self.lookahead_seconds
+                ahead = [
+                    k for k in self._pending
+                    if self.windows[k][0] <= horizon and sum(self.windows[k]) > self.playhead
+                ]
+                behind = [k for k in self._pending if sum(self.windows[k]) <= self.playhead]
+                if ahead:
+                    k = min(ahead, key=lambda k: max(0.0, self.windows[k][0] - self.playhead))
+                elif behind:
+                    k = max(behind, key=lambda k: sum(self.windows[k]))
+                else:
+                    self._condition.wait()
+                    continue
+                self._pending.discard(k)
+                return k
+
+    def _window_done(self):
+        with self._lock:
+            self.chunks_done += 1
+            done = self.chunks_done == len(self.windows)
+        self._publish(done=done)
+        return done
+
+def start_live_caption_pipeline(captions_id, audio_file, transcribe_fn, translate_fn, batch=True,
+                                window_seconds=LIVE_WINDOW_SECONDS, overlap_seconds=LIVE_OVERLAP_SECONDS,
+                                lookahead_seconds=LIVE_LOOKAHEAD_SECONDS, max_workers=LIVE_MAX_WORKERS,
+                                on_complete=None, languages=None):
+    """
+    Starts a just-in-time pipeline and returns its LiveCaptionRun. Workers repeatedly take the
+    pending window nearest the playhead (see LiveCaptionRun.set_playhead), transcribe and
+    translate it and publish its segments, so playback can start as soon as the first window
+    is captioned. Audio whose duration cannot be probed falls back to start_caption_pipeline.
+    on_complete and languages behave as in start_caption_pipeline; on_complete only fires once
+    every window is done.
+    """
+    duration = probe_duration(audio_file)
+    if duration is None:
+        return start_caption_pipeline(captions_id, audio_file, transcribe_fn, translate_fn, batch=batch,
+                                      on_complete=on_complete, languages=languages)
+    windows = plan_chunks(duration, window_seconds, overlap_seconds)
+    run = LiveCaptionRun(captions_id, windows, lookahead_seconds)
+    run._publish()
+    temp_dir = tempfile.mkdtemp(prefix="live_")
+    workers = max(1, min(max_workers, len(windows)))
+    # Workers still running; the last one to exit (finished or stopped) removes temp_dir.
+    active = [workers]
+
+    def work():
+        try:
+            work_windows()
+        finally:
+            with run._lock:
+                active[0] -= 1
+                last = active[0] == 0
+            if last:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def work_windows():
+        while True:
+            k = run._next_window()
+            if k is None:
+                break
+            start, length = windows[k]
+            try:
+                if len(windows) == 1:
+                    result = transcribe_fn(audio_file, length)
+                else:
+                    window_path = os.path.join(temp_dir, f"window_{k:04d}.mp3")
+                    extract_chunk(audio_file, start, length, window_path)
+                    try:
+                        result = transcribe_fn(window_path, length)
+                    finally:
+                        os.remove(window_path)
+                segments = stitch_chunk(windows, k, result.get("segments", []))
+                translated, failures = translate_group(segments, translate_fn, batch, languages)
+                run._publish(translated, failures)
+            except Exception as e:
+                run._publish(error=f"Window at {start:.0f}s: {e}")
+            if run._window_done() and on_complete and not run.error:
+                on_complete(run.snapshot())
+
+    for _ in range(workers):
+        threading.Thread(target=work, daemon=True).start()
+    return run
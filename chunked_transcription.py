@@ -0,0 +1,129 @@
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Audio longer than this is split into chunks that are transcribed concurrently.
+DEFAULT_CHUNK_SECONDS = float(os.getenv("TRANSCRIPTION_CHUNK_SECONDS", "600"))
+# Each chunk also covers this much of the next one so words at a boundary are not cut in half.
+DEFAULT_OVERLAP_SECONDS = float(os.getenv("TRANSCRIPTION_CHUNK_OVERLAP_SECONDS", "5"))
+DEFAULT_MAX_WORKERS = int(os.getenv("TRANSCRIPTION_MAX_WORKERS", "4"))
+
+def probe_duration(filename):
+    """Returns the audio duration in seconds using ffprobe, or None if it cannot be determined."""
+    if shutil.which("ffprobe") is None:
+        return None
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", filename],
+        capture_output=True, text=True
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+def plan_chunks(duration, chunk_seconds=DEFAULT_CHUNK_SECONDS, overlap_seconds=DEFAULT_OVERLAP_SECONDS):
+    """Returns a list of (start, length) windows covering the audio, each overlapping the next."""
+    chunks = []
+    start = 0.0
+    while start < duration:
+        length = min(chunk_seconds + overlap_seconds, duration - start)
+        chunks.append((start, length))
+        if start + length >= duration:
+            break
+        start += chunk_seconds
+    return chunks
+
+def extract_chunk(filename, start, length, output_path):
+    """Cuts one window out of the audio with ffmpeg, re-encoded as compact mono speech audio."""
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", "-ss", f"{start:.3f}", "-t", f"{length:.3f}", "-i", filename,
+         "-vn", "-ac", "1", "-ar", "16000", "-b:a", "48k", output_path],
+        check=True
+    )
+
+def _normalize(text):
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+def stitch_chunk(chunks, k, segments, previous=None):
+    """
+    Shifts one chunk's segments to global time and trims its overlaps.
+    chunks is the list of (start, length) windows and segments carry timestamps relative to
+    chunk k. In each overlap the boundary is placed at its midpoint: the earlier chunk keeps
+    the segments centred before it and the later chunk those centred after it. A segment whose
+    text repeats the previous kept segment is dropped as an overlap duplicate.
+    """
+    start, length = chunks[k]
+    lower = (start + sum(chunks[k - 1])) / 2 if k > 0 else None
+    upper = (chunks[k + 1][0] + start + length) / 2 if k + 1 < len(chunks) else None
+    stitched = []
+    for seg in segments:
+        global_start = round(seg.get("start", 0.0) + start, 2)
+        global_end = round(seg.get("end", 0.0) + start, 2)
+        midpoint = (global_start + global_end) / 2
+        if (lower is not None and midpoint < lower) or (upper is not None and midpoint >= upper):
+            continue
+        text = seg.get("text", "")
+        last = stitched[-1] if stitched else previous
+        if last is not None and _normalize(last["text"]) == _normalize(text):
+            continue
+        stitched.append(dict(seg, start=global_start, end=global_end))
+    return stitched
+
+def stitch_chunk_segments(chunk_results):
+    """
+    Merges per-chunk segments into one global timeline.
+    chunk_results is a list of (start, length, segments) with chunk-relative timestamps.
+    """
+    chunks = [(start, length) for start, length, _ in chunk_results]
+    stitched = []
+    for k, (_, _, segments) in enumerate(chunk_results):
+        stitched.extend(stitch_chunk(chunks, k, segments, stitched[-1] if stitched else None))
+    return stitched
+
+def iter_transcribed_chunks(filename, transcribe_fn, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                            overlap_seconds=DEFAULT_OVERLAP_SECONDS, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Transcribes audio in overlapping chunks concurrently and yields (k, total, segments) in
+    chunk order as soon as each chunk and all chunks before it are done, with segments already
+    stitched onto the global timeline. This lets later stages start before transcription ends.
+    transcribe_fn(path, assumed_duration) must return a dict with "segments" whose timestamps
+    are relative to the file it was given. Short audio, or audio whose duration cannot be
+    probed, is passed to transcribe_fn in a single call and yielded as one chunk.
+    """
+    duration = probe_duration(filename)
+    if duration is None or duration <= chunk_seconds + overlap_seconds:
+        result = transcribe_fn(filename) if duration is None else transcribe_fn(filename, duration)
+        yield 0, 1, result.get("segments", [])
+        return
+
+    chunks = plan_chunks(duration, chunk_seconds, overlap_seconds)
+    with tempfile.TemporaryDirectory(prefix="chunks_") as temp_dir:
+        def transcribe_chunk(k):
+            start, length = chunks[k]
+            chunk_path = os.path.join(temp_dir, f"chunk_{k:04d}.mp3")
+            extract_chunk(filename, start, length, chunk_path)
+            return transcribe_fn(chunk_path, length).get("segments", [])
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+            futures = [executor.submit(transcribe_chunk, k) for k in range(len(chunks))]
+            previous = None
+            for k, future in enumerate(futures):
+                segments = stitch_chunk(chunks, k, future.result(), previous)
+                if segments:
+                    previous = segments[-1]
+                yield k, len(chunks), segments
+
+def transcribe_audio_chunked(filename, transcribe_fn, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                             overlap_seconds=DEFAULT_OVERLAP_SECONDS, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Transcribes long audio by splitting it into overlapping chunks that are sent concurrently.
+    Returns a dict with the full "text" and globally timed "segments".
+    """
+    segments = []
+    for _, _, chunk_segments in iter_transcribed_chunks(filename, transcribe_fn, chunk_seconds,
+                                                        overlap_seconds, max_workers):
+        segments.extend(chunk_segments)
+    return {"text": " ".join(seg.get("text", "").strip() for seg in segments), "segments": segments}
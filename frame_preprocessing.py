@@ -0,0 +1,29 @@
+import cv2
+import numpy as np
+
+DEFAULT_MAX_SIDE = 768
+DEFAULT_JPEG_QUALITY = 70
+# Frames whose perceptual hashes differ in at most this many of 64 bits count as the same scene.
+DEFAULT_DUPLICATE_THRESHOLD = 6
+
+def encode_frame(frame, max_side=DEFAULT_MAX_SIDE, jpeg_quality=DEFAULT_JPEG_QUALITY):
+    """Downscales a BGR frame so its longest side is at most max_side and JPEG-encodes it."""
+    height, width = frame.shape[:2]
+    scale = max_side / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)])
+    return buffer.tobytes()
+
+def frame_hash(frame):
+    """64-bit difference hash (dHash) of a BGR frame; robust to noise, compression and small shifts."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+def hash_distance(hash_a, hash_b):
+    return bin(hash_a ^ hash_b).count("1")
+
+def is_near_duplicate(hash_a, hash_b, threshold=DEFAULT_DUPLICATE_THRESHOLD):
+    return hash_a is not None and hash_b is not None and hash_distance(hash_a, hash_b) <= threshold
@@ -0,0 +1,96 @@
+import cv2
+import numpy as np
+
+# Gaps larger than this many frames are crossed with a seek instead of grabbing frame by frame.
+SEEK_THRESHOLD_FRAMES = 30
+# Mean absolute grayscale difference (0-255) below which a change is treated as noise.
+SCENE_CHANGE_MIN_SCORE = 4.0
+
+def iter_sampled_frames(video, frame_indices, rotate=cv2.ROTATE_90_CLOCKWISE):
+    """
+    Yields (frame_index, frame) for just the requested frames of an opened cv2.VideoCapture.
+    Large gaps are skipped with a seek and small gaps with grab(), which advances the stream
+    without converting frames, so only the sampled frames are fully decoded and rotated.
+    """
+    position = 0
+    for target in sorted(set(frame_indices)):
+        if target - position > SEEK_THRESHOLD_FRAMES:
+            video.set(cv2.CAP_PROP_POS_FRAMES, target)
+            position = target
+        while position < target:
+            if not video.grab():
+                return
+            position += 1
+        success, frame = video.read()
+        if not success:
+            return
+        position += 1
+        yield target, cv2.rotate(frame, rotate) if rotate is not None else frame
+
+def iter_preview_frames(video, frame_indices, preview_fps, fps, rotate=cv2.ROTATE_90_CLOCKWISE):
+    """
+    Walks the whole video with grab(), decoding only preview frames (at roughly preview_fps)
+    and sampled frames. Yields (frame_index, frame, is_sampled).
+    """
+    targets = set(frame_indices)
+    preview_step = max(1, int(round(fps / preview_fps))) if preview_fps else 0
+    frame_index = 0
+    while video.grab():
+        is_sampled = frame_index in targets
+        if is_sampled or (preview_step and frame_index % preview_step == 0):
+            success, frame = video.retrieve()
+            if not success:
+                break
+            yield frame_index, cv2.rotate(frame, rotate) if rotate is not None else frame, is_sampled
+        frame_index += 1
+
+def compute_difference_signal(video, fps, samples_per_second=4, size=(64, 36)):
+    """
+    Cheap scene-change signal: walks the video once, decoding a few frames per second as small
+    grayscale images, and returns (frame_indices, scores) where each score is the mean absolute
+    pixel difference from the previous sampled frame (the first score is 0).
+    The differencing is vectorized over the whole stack with NumPy.
+    """
+    step = max(1, int(round(fps / samples_per_second)))
+    frame_indices = []
+    thumbnails = []
+    frame_index = 0
+    while video.grab():
+        if frame_index % step == 0:
+            success, frame = video.retrieve()
+            if not success:
+                break
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            thumbnails.append(cv2.resize(gray, size, interpolation=cv2.INTER_AREA))
+            frame_indices.append(frame_index)
+        frame_index += 1
+    video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    if not thumbnails:
+        return np.array([], dtype=int), np.array([])
+    stack = np.stack(thumbnails).astype(np.int16)
+    scores = np.zeros(len(thumbnails))
+    scores[1:] = np.abs(np.diff(stack, axis=0)).mean(axis=(1, 2))
+    return np.array(frame_indices), scores
+
+def select_scene_changes(frame_indices, scores, budget, min_gap_frames=0, min_score=SCENE_CHANGE_MIN_SCORE):
+    """
+    Picks at most budget frames: the first frame, then the strongest local peaks of the
+    difference signal above min_score, keeping selections at least min_gap_frames apart.
+    Static stretches produce no peaks, so fewer calls are spent on them.
+    """
+    if len(frame_indices) == 0 or budget <= 0:
+        return []
+    padded = np.concatenate(([-np.inf], scores, [-np.inf]))
+    is_peak = (padded[1:-1] > padded[:-2]) & (padded[1:-1] >= padded[2:]) & (scores >= min_score)
+    candidates = np.flatnonzero(is_peak)
+    candidates = candidates[np.argsort(scores[candidates])[::-1]]
+
+    selected = [int(frame_indices[0])]
+    for i in candidates:
+        if len(selected) >= budget:
+            break
+        index = int(frame_indices[i])
+        if all(abs(index - chosen) >= min_gap_frames for chosen in selected):
+            selected.append(index)
+    return sorted(selected)
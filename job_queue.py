@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import deque
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+# Number of jobs processed at once by this server process.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Finished jobs older than this are deleted from the table.
+JOB_MAX_AGE_SECONDS = int(os.getenv("JOB_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+# Attachments of this many finished jobs are kept so sessions watching them can show the final
+# state; older ones are dropped to free their memory.
+JOB_KEEP_FINISHED_ATTACHMENTS = int(os.getenv("JOB_KEEP_FINISHED_ATTACHMENTS", "8"))
+# How often jobs handed off by their handler are polled for completion.
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class JobQueue:
+    """
+    Persistent queue of background jobs served by a local pool of worker threads.
+    Jobs live in a SQLite table, so their status and per-stage progress outlive page reloads
+    and can be polled by any session; jobs interrupted by a server restart are queued again.
+    Submitting a key that already has a queued or running job returns that job instead of
+    starting a duplicate.
+
+    handler(queue, job) does the work for one job dict; it reports progress with
+    queue.report() and may attach in-memory objects (such as a running pipeline) with
+    queue.attach(). A handler that raises marks its job as failed. Work that keeps running
+    after the handler returns (such as a pipeline with its own threads) is handed off with
+    queue.hand_off(), which frees the worker for the next job. Attachments of finished
+    jobs are kept only for the most recent JOB_KEEP_FINISHED_ATTACHMENTS jobs.
+    """
+
+    def __init__(self, handler, path=JOB_DB_PATH, workers=JOB_WORKERS):
+        self.handler = handler
+        self.path = path
+        self._lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._attachments = {}
+        self._finished_attachments = deque()
+        self._handed_off = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, key TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, "
+                "stage TEXT NOT NULL, progress REAL NOT NULL, detail TEXT NOT NULL, error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)")
+            self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND updated_at < ?",
+                (time.time() - JOB_MAX_AGE_SECONDS,)
+            )
+        for _ in range(max(1, workers)):
+            threading.Thread(target=self._work, daemon=True).start()
+        threading.Thread(target=self._monitor, daemon=True).start()
+
+    def submit(self, key, payload):
+        """Returns the ID of the active job for key, queuing a new one if there is none."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE key = ? AND status IN ('queued', 'running') ORDER BY created_at LIMIT 1",
+                (key,)
+            ).fetchone()
+            if row is not None:
+                return row[0]
+            job_id = uuid.uuid4().hex[:12]
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, key, payload, status, stage, progress, detail, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', 'queued', 0.0, 'Waiting for a worker...', ?, ?)",
+                (job_id, key, json.dumps(payload), now, now)
+            )
+        with self._wake:
+            self._wake.notify()
+        return job_id
+
+    def get(self, job_id):
+        """Returns the job as a dict, or None if it does not exist."""
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(zip([column[0] for column in cursor.description], row))
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def report(self, job_id, stage, progress, detail=""):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, detail = ?, updated_at = ? WHERE job_id = ?",
+                (stage, min(1.0, max(0.0, progress)), detail, time.time(), job_id)
+            )
+
+    def attach(self, job_id, obj):
+        with self._lock:
+            self._attachments[job_id] = obj
+
+    def attachment(self, job_id):
+        """Returns the object a handler attached to the job in this process, or None."""
+        with self._lock:
+            return self._attachments.get(job_id)
+
+    def hand_off(self, job_id, poll):
+        """
+        Lets the handler return while the job keeps running elsewhere. poll() is then called about
+        every JOB_POLL_SECONDS and returns None while the job runs, or (status, error) to finish it
+        ("done", "failed" or "stopped"); a poll that raises fails the job.
+        """
+        with self._lock:
+            self._handed_off[job_id] = poll
+
+    def _claim(self):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE job_id = ?", (time.time(), row[0])
+            )
+        return self.get(row[0])
+
+    def _finish(self, job_id, status, error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, time.time(), job_id)
+            )
+            if job_id in self._attachments:
+                self._finished_attachments.append(job_id)
+                while len(self._finished_attachments) > JOB_KEEP_FINISHED_ATTACHMENTS:
+                    self._attachments.pop(self._finished_attachments.popleft(), None)
+
+    def _work(self):
+        while True:
+            job = self._claim()
+            if job is None:
+                with self._wake:
+                    self._wake.wait(5.0)
+                continue
+            try:
+                self.handler(self, job)
+            except Exception as e:
+                with self._lock:
+                    self._handed_off.pop(job["job_id"], None)
+                self._finish(job["job_id"], "failed", str(e))
+            else:
+                with self._lock:
+                    handed_off = job["job_id"] in self._handed_off
+                if not handed_off:
+                    self._finish(job["job_id"], "done")
+
+    def _monitor(self):
+        while True:
+            time.sleep(JOB_POLL_SECONDS)
+            with self._lock:
+                polls = list(self._handed_off.items())
+            for job_id, poll in polls:
+                try:
+                    result = poll()
+                except Exception as e:
+                    result = ("failed", str(e))
+                if result is not None:
+                    with self._lock:
+                        self._handed_off.pop(job_id, None)
+                    self._finish(job_id, *result)
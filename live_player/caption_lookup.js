@@ -0,0 +1,72 @@
+// Caption lookup shared by both players (the live component loads this file; the embedded
+// player in video_analyzer_v2.py inlines it). Captions are the compact start/end/text arrays
+// published by caption_pipeline.compact_segments, sorted by start time.
+function CaptionLookup(captions) {
+  this.captions = captions || {starts: [], ends: [], texts: []};
+  // Index of the segment found last; playback usually stays on it or moves to the next one.
+  this.cursor = 0;
+  // Language track selected by the viewer (null for the primary track).
+  this.track = null;
+}
+
+CaptionLookup.prototype.setCaptions = function(captions) {
+  this.captions = captions;
+  this.cursor = 0;
+};
+
+// Returns the index of the segment covering time t, or -1.
+CaptionLookup.prototype.find = function(t) {
+  var starts = this.captions.starts, ends = this.captions.ends, cursor = this.cursor;
+  if (cursor < starts.length && t >= starts[cursor] && t <= ends[cursor]) {
+    return cursor;
+  }
+  if (cursor + 1 < starts.length && t >= starts[cursor + 1] && t <= ends[cursor + 1]) {
+    return ++this.cursor;
+  }
+  if (cursor < starts.length && t > ends[cursor] && (cursor + 1 >= starts.length || t < starts[cursor + 1])) {
+    return -1;  // In the gap right after the current segment.
+  }
+  // After a seek, binary search for the last segment starting at or before t.
+  var lo = 0, hi = starts.length - 1, found = -1;
+  while (lo <= hi) {
+    var mid = (lo + hi) >> 1;
+    if (starts[mid] <= t) {
+      found = mid;
+      lo = mid + 1;
+    } else {
+      hi = mid - 1;
+    }
+  }
+  if (found >= 0) {
+    this.cursor = found;
+    if (t <= ends[found]) {
+      return found;
+    }
+  }
+  return -1;
+};
+
+// Text of a segment in the selected language track.
+CaptionLookup.prototype.text = function(index) {
+  var tracks = this.captions.tracks;
+  return this.track && tracks && tracks[this.track] ? tracks[this.track][index] : this.captions.texts[index];
+};
+
+// True while a streamed segment's translation is still being generated.
+CaptionLookup.prototype.isPartial = function(index) {
+  return Boolean(index >= 0 && this.captions.partial && this.captions.partial[index]);
+};
+
+// Fills a <select> with the available language tracks once a multi-language payload has arrived.
+CaptionLookup.prototype.updateTrackMenu = function(menu) {
+  var languages = this.captions.tracks ? Object.keys(this.captions.tracks) : [];
+  if (languages.length < 2 || menu.options.length === languages.length) {
+    return;
+  }
+  menu.innerHTML = "";
+  languages.forEach(function(language) {
+    menu.add(new Option(language, language));
+  });
+  menu.value = this.track || languages[0];
+  menu.style.display = "inline";
+};
@@ -0,0 +1,174 @@
+import json
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets; a final +Inf bucket is implied.
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+# Recent latencies kept per stage for percentile summaries.
+RECENT_SAMPLES = 1024
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers (p in 0-100); 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+class StageStats:
+    """Counts, bytes, token usage and a latency histogram for one pipeline stage."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_sum = 0.0
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, latency, error, size, prompt_tokens, completion_tokens):
+        self.count += 1
+        self.errors += int(error)
+        self.bytes += size
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.latency_sum += latency
+        self.recent.append(latency)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.bucket_counts[i] += 1
+                break
+        else:
+            self.bucket_counts[-1] += 1
+
+    def percentile(self, p):
+        return percentile(self.recent, p)
+
+class Span:
+    """Mutable record of one timed operation; call sites attach bytes and token usage to it."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record_usage(self, usage):
+        """Adds token counts from an API response's usage object (or dict), if present."""
+        if usage is None:
+            return
+        if not isinstance(usage, dict):
+            usage = {"prompt_tokens": getattr(usage, "prompt_tokens", 0),
+                     "completion_tokens": getattr(usage, "completion_tokens", 0)}
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.completion_tokens += usage.get("completion_tokens") or 0
+
+class MetricsRegistry:
+    """Thread-safe per-stage metrics with JSON and Prometheus text exports."""
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, latency, error=False, size=0, prompt_tokens=0, completion_tokens=0):
+        """Records one operation of stage measured by the caller (e.g. a time-to-first-token)."""
+        with self._lock:
+            stats = self._stages.setdefault(stage, StageStats())
+            stats.observe(latency, error, size, prompt_tokens, completion_tokens)
+
+    @contextmanager
+    def timed(self, stage):
+        """Times the enclosed block as one operation of stage, counting it as an error if it raises."""
+        span = Span()
+        start = time.perf_counter()
+        error = False
+        try:
+            yield span
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, error, span.bytes, span.prompt_tokens, span.completion_tokens)
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def summary(self):
+        """Returns one dict per stage with counts, totals and latency percentiles (seconds)."""
+        with self._lock:
+            return [
+                {
+                    "stage": stage,
+                    "count": stats.count,
+                    "errors": stats.errors,
+                    "bytes": stats.bytes,
+                    "prompt_tokens": stats.prompt_tokens,
+                    "completion_tokens": stats.completion_tokens,
+                    "mean_s": round(stats.latency_sum / stats.count, 4) if stats.count else 0.0,
+                    "p50_s": round(stats.percentile(50), 4),
+                    "p95_s": round(stats.percentile(95), 4),
+                    "max_s": round(max(stats.recent), 4) if stats.recent else 0.0,
+                }
+                for stage, stats in sorted(self._stages.items())
+            ]
+
+    def export_json(self):
+        with self._lock:
+            histograms = {
+                stage: {"buckets": LATENCY_BUCKETS + ["+Inf"], "counts": list(stats.bucket_counts)}
+                for stage, stats in self._stages.items()
+            }
+        return json.dumps({"stages": self.summary(), "latency_histograms": histograms}, indent=2)
+
+    def export_prometheus(self, prefix="pipeline"):
+        """Renders all stages in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {prefix}_stage_latency_seconds Latency of pipeline stage operations.",
+            f"# TYPE {prefix}_stage_latency_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted(self._stages.items())
+            for stage, stats in stages:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ["+Inf"], stats.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_latency_seconds_sum{{stage="{stage}"}} {stats.latency_sum}')
+                lines.append(f'{prefix}_stage_latency_seconds_count{{stage="{stage}"}} {stats.count}')
+            for name, help_text, value in [
+                ("errors_total", "Failed pipeline stage operations.", lambda s: s.errors),
+                ("bytes_total", "Bytes transferred by pipeline stage operations.", lambda s: s.bytes),
+                ("prompt_tokens_total", "Prompt tokens used by pipeline stage operations.", lambda s: s.prompt_tokens),
+                ("completion_tokens_total", "Completion tokens used by pipeline stage operations.", lambda s: s.completion_tokens),
+            ]:
+                lines.append(f"# HELP {prefix}_stage_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_stage_{name} counter")
+                for stage, stats in stages:
+                    lines.append(f'{prefix}_stage_{name}{{stage="{stage}"}} {value(stats)}')
+        return "\n".join(lines) + "\n"
+
+_registry = MetricsRegistry()
+
+def get_metrics():
+    """Returns the process-wide metrics registry."""
+    return _registry
+
+def timed(stage):
+    """Shortcut for get_metrics().timed(stage)."""
+    return _registry.timed(stage)
+
+def render_metrics_panel(st, registry=None):
+    """
+    Renders the per-stage metrics table with JSON and Prometheus downloads in an expander.
+    Takes the streamlit module so this module stays importable without it.
+    """
+    registry = registry or _registry
+    with st.expander("Performance metrics"):
+        st.dataframe(registry.summary())
+        st.download_button("Download metrics (JSON)", registry.export_json(), file_name="metrics.json", mime="application/json")
+        st.download_button("Download metrics (Prometheus)", registry.export_prometheus(), file_name="metrics.prom", mime="text/plain")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Groq API used by the benchmarks.
+Implements the audio.translations and chat.completions (including streamed and image) endpoints with configurable latency,
+jitter and error rate, so the pipeline can be measured without credentials or network access.
+Point a client at it with GROQ_BASE_URL=http://127.0.0.1:<port>.
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_SENTENCES = [
+    "Bienvenidos a este video sobre inteligencia artificial.",
+    "Hoy vamos a hablar de la traducción en tiempo real.",
+    "La latencia es muy importante para los usuarios.",
+    "Gracias por ver y no olvides suscribirte.",
+]
+
+class MockInferenceServer:
+    """
+    Threaded HTTP server faking Groq endpoints. Each request sleeps for latency plus uniform
+    jitter, then fails with HTTP 500 with probability error_rate. When rate_limit_rpm is set,
+    requests beyond that many in the trailing minute get HTTP 429 with a retry-after header.
+    Streamed chat completions send one word per chunk, stream_interval seconds apart.
+    Request counts are recorded.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, jitter=0.05, error_rate=0.0,
+                 segments=200, segment_seconds=4.0, seed=None, rate_limit_rpm=None, stream_interval=0.02):
+        self.latency = latency
+        self.stream_interval = stream_interval
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rpm = rate_limit_rpm
+        self._recent_requests = deque()
+        self.segments = segments
+        self.segment_seconds = segment_seconds
+        self.request_counts = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _rate_limited(self):
+        """Returns seconds until a slot frees up if the trailing-minute limit is exceeded, else None."""
+        if not self.rate_limit_rpm:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            while self._recent_requests and now - self._recent_requests[0] > 60:
+                self._recent_requests.popleft()
+            if len(self._recent_requests) >= self.rate_limit_rpm:
+                self.request_counts["rate_limited"] = self.request_counts.get("rate_limited", 0) + 1
+                return 60 - (now - self._recent_requests[0])
+            self._recent_requests.append(now)
+        return None
+
+    def _delay_and_maybe_fail(self, endpoint):
+        with self._lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.error_rate
+        time.sleep(delay)
+        return fail
+
+    def transcription_response(self):
+        segments = []
+        for i in range(self.segments):
+            segments.append({
+                "id": i,
+                "start": round(i * self.segment_seconds, 2),
+                "end": round((i + 1) * self.segment_seconds, 2),
+                "text": f"{SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)]} ({i})",
+            })
+        return {
+            "task": "translate",
+            "language": "english",
+            "duration": self.segments * self.segment_seconds,
+            "text": " ".join(seg["text"] for seg in segments),
+            "segments": segments,
+        }
+
+    def chat_response(self, body):
+        messages = body.get("messages", [])
+        user_content = messages[-1]["content"] if messages else ""
+        if isinstance(user_content, list):
+            # Vision request: one description per image, as JSON when several frames were sent.
+            images = sum(1 for part in user_content if part.get("type") == "image_url")
+            if images > 1:
+                content = json.dumps({"frames": [{"id": i, "description": f"Mock scene {i}"} for i in range(1, images + 1)]})
+            else:
+                content = "Mock scene"
+        elif body.get("response_format", {}).get("type") == "json_object":
+            items = json.loads(user_content).get("segments", [])
+            content = json.dumps({"translations": [{"id": item["id"], "text": f"EN {item['text']}"} for item in items]})
+        else:
+            content = "EN " + re.sub(r"^Translate the following text to [^:]+: ", "", user_content)
+        completion_tokens = len(content) // 4 + 1
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4 + 1
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, completion):
+                """Sends a chat completion as server-sent events, one word per chunk."""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                words = re.findall(r"\S+\s*", completion["choices"][0]["message"]["content"])
+                for i, word in enumerate(words):
+                    chunk = {"id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"],
+                             "model": completion["model"],
+                             "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                    if i == len(words) - 1:
+                        chunk["choices"][0]["finish_reason"] = "stop"
+                        chunk["x_groq"] = {"id": completion["id"], "usage": completion["usage"]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(server.stream_interval)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path.endswith("/audio/translations") or self.path.endswith("/audio/transcriptions"):
+                    endpoint, respond = "audio.translations", server.transcription_response
+                elif self.path.endswith("/chat/completions"):
+                    endpoint, respond = "chat.completions", lambda: server.chat_response(json.loads(body))
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                retry_after = server._rate_limited()
+                if retry_after is not None:
+                    self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                                    {"retry-after": f"{retry_after:.2f}"})
+                    return
+                if server._delay_and_maybe_fail(endpoint):
+                    self._send_json(500, {"error": {"message": "Injected mock failure", "type": "server_error"}})
+                    return
+                if endpoint == "chat.completions" and json.loads(body).get("stream"):
+                    self._send_stream(respond())
+                    return
+                self._send_json(200, respond())
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the Groq inference API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Mean response latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Uniform latency jitter in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an HTTP 500 response.")
+    parser.add_argument("--segments", type=int, default=200, help="Segments returned per transcription.")
+    parser.add_argument("--rate-limit-rpm", type=int, help="Answer HTTP 429 beyond this many requests per minute.")
+    args = parser.parse_args()
+
+    server = MockInferenceServer(port=args.port, latency=args.latency, jitter=args.jitter,
+                                 error_rate=args.error_rate, segments=args.segments,
+                                 rate_limit_rpm=args.rate_limit_rpm).start()
+    print(f"Mock inference server listening on {server.base_url} (set GROQ_BASE_URL to use it)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import time
+import random
+import threading
+from contextlib import nullcontext
+from metrics import Span, get_metrics, timed
+
+# Per-model request and token limits (per minute). Override with RATE_LIMITS, a JSON object
+# such as {"llama-3.3-70b-versatile": {"rpm": 30, "tpm": 6000}}. A None limit is unlimited.
+DEFAULT_MODEL_LIMITS = {
+    "llama-3.3-70b-versatile": {"rpm": 300, "tpm": 100000},
+    "whisper-large-v3": {"rpm": 100, "tpm": None},
+    "llama-3.2-11b-vision-preview": {"rpm": 300, "tpm": 100000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+}
+FALLBACK_LIMITS = {"rpm": 60, "tpm": None}
+# Keep sustained throughput slightly below the configured limits.
+HEADROOM = float(os.getenv("RATE_LIMIT_HEADROOM", "0.9"))
+MAX_ATTEMPTS = int(os.getenv("RATE_LIMIT_MAX_ATTEMPTS", "6"))
+BASE_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+# Bounds for the adaptive (AIMD) concurrency limit per model.
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "16"))
+INITIAL_CONCURRENCY = int(os.getenv("RATE_LIMIT_INITIAL_CONCURRENCY", "4"))
+
+def _load_limits():
+    limits = {model: dict(values) for model, values in DEFAULT_MODEL_LIMITS.items()}
+    override = os.getenv("RATE_LIMITS")
+    if override:
+        for model, values in json.loads(override).items():
+            limits.setdefault(model, dict(FALLBACK_LIMITS)).update(values)
+    return limits
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate units per second up to capacity."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount units are available (0 if they are available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self, now):
+        """Empties the bucket, e.g. after the provider reports the limit was hit."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+class ModelScheduler:
+    """
+    Admission control for one model: request and token buckets plus an AIMD concurrency
+    limit that grows by about one slot per round of successful calls and halves on a 429.
+    """
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm * HEADROOM / 60.0, max(1.0, rpm * HEADROOM / 60.0 * 5)) if rpm else None
+        self.tokens = TokenBucket(tpm * HEADROOM / 60.0, tpm * HEADROOM / 6.0) if tpm else None
+        self.concurrency = float(INITIAL_CONCURRENCY)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self, estimated_tokens):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wait = self.paused_until - now
+                if self.in_flight >= int(self.concurrency):
+                    wait = max(wait, 0.05)
+                if self.requests:
+                    wait = max(wait, self.requests.wait_time(1, now))
+                if self.tokens and estimated_tokens:
+                    wait = max(wait, self.tokens.wait_time(estimated_tokens, now))
+                if wait <= 0:
+                    break
+                self._condition.wait(wait)
+            if self.requests:
+                self.requests.take(1, now)
+            if self.tokens and estimated_tokens:
+                self.tokens.take(estimated_tokens, now)
+            self.in_flight += 1
+
+    def release(self, outcome, retry_after=None):
+        """outcome is "ok", "rate_limited" or "error"."""
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if outcome == "ok":
+                self.concurrency = min(MAX_CONCURRENCY, self.concurrency + 1.0 / self.concurrency)
+            elif outcome == "rate_limited":
+                # Halve at most once per second so a burst of 429s does not collapse the limit.
+                if now - self.last_decrease > 1.0:
+                    self.concurrency = max(MIN_CONCURRENCY, self.concurrency / 2)
+                    self.last_decrease = now
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+                for bucket in (self.requests, self.tokens):
+                    if bucket:
+                        bucket.drain(now)
+            self._condition.notify_all()
+
+def _parse_duration(value):
+    """Parses header durations such as "2", "0.5", "1m30s" or "250ms" into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+def retry_after_seconds(error):
+    """Reads the provider's suggested wait from a rate-limit error's response headers."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    milliseconds = _parse_duration(headers.get("retry-after-ms"))
+    if milliseconds is not None:
+        return milliseconds / 1000.0
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        seconds = _parse_duration(headers.get(name))
+        if seconds is not None:
+            return seconds
+    return None
+
+def classify_error(error):
+    """Returns "rate_limited", "retryable" or "fatal" for an exception raised by an API client."""
+    status = getattr(error, "status_code", None)
+    if status == 429:
+        return "rate_limited"
+    if status is not None and status >= 500:
+        return "retryable"
+    if type(error).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return "retryable"
+    return "fatal"
+
+class RequestScheduler:
+    """Process-wide scheduler shared by every API call site; one ModelScheduler per model."""
+
+    def __init__(self, limits=None):
+        self.limits = limits if limits is not None else _load_limits()
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, model):
+        with self._lock:
+            if model not in self._models:
+                limits = self.limits.get(model, FALLBACK_LIMITS)
+                self._models[model] = ModelScheduler(limits.get("rpm"), limits.get("tpm"))
+            return self._models[model]
+
+    def call(self, model, fn, estimated_tokens=0):
+        """
+        Runs fn() once the model's rate limits and concurrency allow it. Rate-limit and transient
+        errors are retried with exponential backoff and full jitter, waiting at least as long as
+        the provider's retry-after header asks; other errors are raised immediately.
+        """
+        scheduler = self._model(model)
+        for attempt in range(MAX_ATTEMPTS):
+            scheduler.acquire(estimated_tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                kind = classify_error(e)
+                retry_after = retry_after_seconds(e) if kind == "rate_limited" else None
+                scheduler.release("rate_limited" if kind == "rate_limited" else "error", retry_after)
+                if kind == "fatal" or attempt == MAX_ATTEMPTS - 1:
+                    raise
+                backoff = random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt))
+                time.sleep(max(backoff, retry_after or 0.0))
+                continue
+            scheduler.release("ok")
+            return result
+
+    def timed_call(self, stage, model, fn, estimated_tokens=0, timing=None, record=True):
+        """
+        Like call(), but fn(span) is timed as one operation of stage per attempt, so the stage's
+        latency covers only the API call (a failed attempt counts as an error). Time spent waiting
+        for a slot and backing off between attempts is recorded as "<stage>:queue". When given,
+        timing receives the last attempt's "round_trip" and the "queued" seconds.
+        record=False skips the metrics.
+        """
+        timing = timing if timing is not None else {}
+        attempts = {"seconds": 0.0}
+
+        def attempt():
+            start = time.perf_counter()
+            try:
+                with (timed(stage) if record else nullcontext(Span())) as span:
+                    result = fn(span)
+            finally:
+                timing["round_trip"] = time.perf_counter() - start
+                attempts["seconds"] += timing["round_trip"]
+            return result
+
+        start = time.perf_counter()
+        result = self.call(model, attempt, estimated_tokens)
+        timing["queued"] = max(0.0, time.perf_counter() - start - attempts["seconds"])
+        if record:
+            get_metrics().observe(f"{stage}:queue", timing["queued"])
+        return result
+
+    def concurrency(self, model):
+        return self._model(model).concurrency
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Returns the process-wide request scheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
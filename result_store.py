@@ -0,0 +1,89 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from translation_pipeline import (
+    BATCH_SYSTEM_PROMPT, DEFAULT_LANGUAGE, TRANSLATION_MODEL, TRANSLATION_SYSTEM_PROMPT, TRANSLATION_TEMPERATURE,
+)
+
+DEFAULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", "result_store.sqlite3")
+# Results older than this are treated as missing and recomputed.
+DEFAULT_MAX_AGE_SECONDS = int(os.getenv("RESULT_STORE_MAX_AGE_SECONDS", str(90 * 24 * 3600)))
+
+TRANSCRIPTION_MODEL = "whisper-large-v3"
+# Models that produce a stored result; part of every key.
+RESULT_MODEL = f"{TRANSCRIPTION_MODEL}+{TRANSLATION_MODEL}"
+
+def prompt_version(languages=None):
+    """
+    Short hash of the translation prompts and settings, so editing a prompt invalidates stored
+    results. Multi-language results also hash their language list.
+    """
+    prompts = [TRANSLATION_SYSTEM_PROMPT, BATCH_SYSTEM_PROMPT, TRANSLATION_TEMPERATURE]
+    if languages and list(languages) != [DEFAULT_LANGUAGE]:
+        prompts.append(list(languages))
+    material = json.dumps(prompts)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:12]
+
+class ResultStore:
+    """
+    On-disk SQLite store of finished whole-video results (the translated segment list), keyed
+    by video ID, model and prompt version. Shared by every session and thread in the process.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, max_age_seconds=DEFAULT_MAX_AGE_SECONDS):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "video_id TEXT NOT NULL, model TEXT NOT NULL, prompt_version TEXT NOT NULL, "
+                "segments TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (video_id, model, prompt_version))"
+            )
+
+    def get(self, video_id, model=RESULT_MODEL, version=None):
+        """Returns the stored segment list, or None on a miss or an expired entry."""
+        version = version or prompt_version()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT segments, created_at FROM results WHERE video_id = ? AND model = ? AND prompt_version = ?",
+                (video_id, model, version)
+            ).fetchone()
+            if row is None or time.time() - row[1] > self.max_age_seconds:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, video_id, segments, model=RESULT_MODEL, version=None):
+        version = version or prompt_version()
+        data = json.dumps(segments, ensure_ascii=False, separators=(",", ":"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (video_id, model, prompt_version, segments, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (video_id, model, version, data, time.time())
+            )
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+def get_result_store():
+    """Returns the process-wide result store."""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = ResultStore()
+        return _shared_store
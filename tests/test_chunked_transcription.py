@@ -0,0 +1,26 @@
+from chunked_transcription import stitch_chunk, stitch_chunk_segments
+
+# Two 60s chunks overlapping by 10s: the boundary between them is at 55s.
+CHUNKS = [(0.0, 60.0), (50.0, 60.0)]
+
+def test_stitch_chunk_splits_overlap_at_midpoint():
+    first = stitch_chunk(CHUNKS, 0, [
+        {"start": 40.0, "end": 44.0, "text": "kept"},
+        {"start": 52.0, "end": 57.0, "text": "centred before the boundary"},
+        {"start": 55.0, "end": 59.0, "text": "centred after the boundary"},
+    ])
+    second = stitch_chunk(CHUNKS, 1, [
+        {"start": 2.0, "end": 7.0, "text": "centred before the boundary"},
+        {"start": 5.0, "end": 9.0, "text": "centred after the boundary"},
+        {"start": 20.0, "end": 25.0, "text": "later"},
+    ])
+    assert [seg["text"] for seg in first] == ["kept", "centred before the boundary"]
+    assert [seg["text"] for seg in second] == ["centred after the boundary", "later"]
+    assert (second[0]["start"], second[0]["end"]) == (55.0, 59.0)
+
+def test_stitch_chunk_segments_drops_repeated_text():
+    stitched = stitch_chunk_segments([
+        (0.0, 60.0, [{"start": 50.0, "end": 54.0, "text": "Hello there."}]),
+        (50.0, 60.0, [{"start": 4.6, "end": 8.0, "text": "hello there"}, {"start": 10.0, "end": 12.0, "text": "Next."}]),
+    ])
+    assert [(seg["start"], seg["text"]) for seg in stitched] == [(50.0, "Hello there."), (60.0, "Next.")]
@@ -0,0 +1,48 @@
+import json
+from translation_pipeline import parse_batch_response, translate_segments_batched
+
+def test_parse_batch_response_skips_malformed_items():
+    content = json.dumps({"translations": [
+        {"id": 1, "text": " one "}, {"id": "2", "text": "two"}, {"id": 3, "text": ""},
+        {"id": 9, "text": "out of range"}, {"id": "x", "text": "bad id"}, "not an object",
+    ]})
+    assert parse_batch_response(content, 3) == {1: "one", 2: "two"}
+
+def test_parse_batch_response_rejects_invalid_json():
+    assert parse_batch_response("not json", 2) == {}
+    assert parse_batch_response(None, 2) == {}
+    assert parse_batch_response(json.dumps({"translations": "nope"}), 2) == {}
+
+def test_batched_falls_back_per_segment_for_missing_items():
+    segments = [{"start": i, "end": i + 1, "text": f"t{i}"} for i in range(4)]
+    singles = []
+
+    def batch_fn(texts):
+        # Only the first item of each batch comes back.
+        return {1: texts[0].upper()}
+
+    def translate_fn(text):
+        singles.append(text)
+        if text == "t3":
+            raise RuntimeError("boom")
+        return text + "!"
+
+    translated, failures = translate_segments_batched(
+        segments, translate_fn, batch_fn=batch_fn, use_cache=False, max_workers=1
+    )
+    assert translated[0]["text"] == "T0"
+    assert sorted(singles) == ["t1", "t2", "t3"]
+    assert [seg["text"] for seg in translated[1:]] == ["t1!", "t2!", "t3"]
+    assert failures == [{"index": 3, "text": "t3", "error": "boom"}]
+
+def test_batched_falls_back_when_whole_batch_fails():
+    segments = [{"text": "a"}, {"text": "b"}, {"text": "a"}]
+
+    def batch_fn(texts):
+        raise RuntimeError("batch failed")
+
+    translated, failures = translate_segments_batched(
+        segments, lambda text: text.upper(), batch_fn=batch_fn, use_cache=False
+    )
+    assert [seg["text"] for seg in translated] == ["A", "B", "A"]
+    assert failures == []
@@ -0,0 +1,57 @@
+import numpy as np
+import voice_activity
+from voice_activity import FRAME_SECONDS, extract_speech, flags_to_regions, to_original_time
+
+def frames_of(flags):
+    frame_samples = int(voice_activity.SAMPLE_RATE * FRAME_SECONDS)
+    return [np.full(frame_samples, 1000 if flag else 0, dtype=np.int16) for flag in flags]
+
+class FakeEncoder:
+    """Stands in for the ffmpeg encoder process and collects the frames written to it."""
+
+    def __init__(self, *args, **kwargs):
+        self.stdin = self
+        self.chunks = []
+        FakeEncoder.last = self
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def close(self):
+        pass
+
+    def wait(self):
+        return 0
+
+def test_regions_fall_on_frame_boundaries():
+    flags = [False] * 100 + [True] * 37 + [False] * 200 + [True] * 53 + [False] * 10
+    regions = flags_to_regions(flags)
+    assert len(regions) == 2
+    for start, end in regions:
+        assert abs(start / FRAME_SECONDS - round(start / FRAME_SECONDS)) < 1e-6
+        assert abs(end / FRAME_SECONDS - round(end / FRAME_SECONDS)) < 1e-6
+
+def test_extract_speech_writes_exactly_the_regions(monkeypatch):
+    # About an hour of alternating speech and silence, long enough for float drift to show.
+    flags = ([True] * 150 + [False] * 90) * 500
+    regions = flags_to_regions(flags)
+    monkeypatch.setattr(voice_activity, "_iter_frames", lambda path, frame_samples: iter(frames_of(flags)))
+    monkeypatch.setattr(voice_activity.subprocess, "Popen", FakeEncoder)
+    written = extract_speech("in.mp3", regions, "out.mp3")
+    expected = sum(end - start for start, end in regions)
+    assert abs(written - expected) < FRAME_SECONDS / 2
+    assert len(FakeEncoder.last.chunks) == round(expected / FRAME_SECONDS)
+
+def test_to_original_time_round_trip():
+    regions = [(1.5, 4.5), (10.2, 12.0), (30.0, 31.2)]
+    assert to_original_time(0.0, regions) == 1.5
+    assert to_original_time(2.0, regions) == 3.5
+    # The joint between the first two regions maps to either side of the gap.
+    assert to_original_time(3.0, regions) == 10.2
+    assert to_original_time(3.0, regions, prefer_end=True) == 4.5
+    assert to_original_time(4.0, regions) == 11.2
+    assert to_original_time(100.0, regions) == 31.2
+    elapsed = 0.0
+    for start, end in regions:
+        assert to_original_time(elapsed, regions) == round(start, 2)
+        elapsed += end - start
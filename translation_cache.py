@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "translation_cache.sqlite3")
+# Entries beyond this count are evicted, least recently used first.
+DEFAULT_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "100000"))
+# Entries older than this are evicted regardless of use.
+DEFAULT_MAX_AGE_SECONDS = int(os.getenv("TRANSLATION_CACHE_MAX_AGE_SECONDS", str(30 * 24 * 3600)))
+# Run eviction once every this many writes rather than on every put.
+EVICT_EVERY_PUTS = 200
+
+def make_cache_key(text, model, prompt, temperature):
+    """Content-addressed key: a hash of everything that determines the translation."""
+    material = json.dumps([text, model, prompt, temperature], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class TranslationCache:
+    """
+    On-disk SQLite cache of translations keyed by source text, model, prompt and temperature.
+    Safe to share between threads. Tracks hit and miss counts for the current process.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_age_seconds=DEFAULT_MAX_AGE_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, translation TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed_at)")
+        self.evict()
+
+    def get(self, text, model, prompt, temperature):
+        """Returns the cached translation, or None on a miss or an expired entry."""
+        key = make_cache_key(text, model, prompt, temperature)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT translation, created_at FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE translations SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, text, model, prompt, temperature, translation):
+        key = make_cache_key(text, model, prompt, temperature)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, translation, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, translation, now, now)
+            )
+            self._puts += 1
+            due = self._puts % EVICT_EVERY_PUTS == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drops expired entries, then the least recently used ones above max_entries."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM translations WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+            )
+            self._conn.execute(
+                "DELETE FROM translations WHERE key IN ("
+                "SELECT key FROM translations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_translation_cache():
+    """Returns the process-wide cache, so Streamlit reruns and worker threads share one connection."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = TranslationCache()
+        return _shared_cache
+
+def configure_translation_cache(path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES,
+                                max_age_seconds=DEFAULT_MAX_AGE_SECONDS):
+    """Replaces the process-wide cache, e.g. to point benchmarks at a fresh, cold cache file."""
+    global _shared_cache
+    with _shared_cache_lock:
+        _shared_cache = TranslationCache(path, max_entries, max_age_seconds)
+        return _shared_cache
@@ -0,0 +1,322 @@
+import os
+import re
+import json
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from api_clients import get_groq_client
+from rate_limiter import get_scheduler
+from translation_cache import get_translation_cache
+
+# Maximum number of translation requests in flight at once.
+DEFAULT_MAX_WORKERS = int(os.getenv("TRANSLATION_MAX_WORKERS", "8"))
+# Approximate number of source tokens packed into a single batched request.
+DEFAULT_BATCH_TOKEN_BUDGET = int(os.getenv("TRANSLATION_BATCH_TOKENS", "2000"))
+# Hard cap on segments per batched request, regardless of the token budget.
+MAX_BATCH_SEGMENTS = 50
+
+TRANSLATION_MODEL = "llama-3.3-70b-versatile"
+TRANSLATION_TEMPERATURE = 0.5
+DEFAULT_LANGUAGE = "English"
+# Target languages for multi-language runs, comma separated; the first one is the primary track.
+TRANSLATION_LANGUAGES = [lang.strip() for lang in os.getenv("TRANSLATION_LANGUAGES", DEFAULT_LANGUAGE).split(",") if lang.strip()]
+TRANSLATION_SYSTEM_PROMPT_TEMPLATE = "You are a translation assistant. Your task is to translate the provided text strictly into {language} and output only the translated text. If you are unable to translate, return the original text as is."
+BATCH_SYSTEM_PROMPT_TEMPLATE = (
+    "You are a translation assistant. You will receive a JSON object with a list of numbered segments. "
+    "Translate the text of every segment strictly into {language}. "
+    'Respond with only a JSON object of the form {{"translations": [{{"id": <id>, "text": "<translation>"}}]}} '
+    "containing exactly one entry for each input id. "
+    "If you are unable to translate a segment, return its original text as is."
+)
+
+def translation_system_prompt(language=DEFAULT_LANGUAGE):
+    return TRANSLATION_SYSTEM_PROMPT_TEMPLATE.format(language=language)
+
+def batch_system_prompt(language=DEFAULT_LANGUAGE):
+    return BATCH_SYSTEM_PROMPT_TEMPLATE.format(language=language)
+
+TRANSLATION_SYSTEM_PROMPT = translation_system_prompt()
+BATCH_SYSTEM_PROMPT = batch_system_prompt()
+
+def for_language(fn, language):
+    """Binds language to a translation function; the default language keeps the plain fn(text) call."""
+    return fn if language == DEFAULT_LANGUAGE else partial(fn, language=language)
+
+def estimate_tokens(text):
+    """Rough token estimate (about four characters per token) used for batch packing."""
+    return len(text) // 4 + 1
+
+def pack_batches(segments, token_budget=DEFAULT_BATCH_TOKEN_BUDGET, max_segments=MAX_BATCH_SEGMENTS):
+    """
+    Groups segment indices into consecutive batches whose estimated token count stays
+    within token_budget. A single segment larger than the budget gets a batch of its own.
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for i, seg in enumerate(segments):
+        tokens = estimate_tokens(seg.get("text", ""))
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_segments):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def transcribe_audio(filename, assumed_duration=90.0):
+    """
+    Transcribes (and translates to English) an audio file with Groq's Whisper model.
+    If no timestamped segments are returned, the full text is split into sentences with
+    estimated timings spread over assumed_duration.
+    """
+    client = get_groq_client()
+    with open(filename, "rb") as file:
+
+        def request(span):
+            span.bytes = os.path.getsize(filename)
+            file.seek(0)  # Rewind in case the scheduler retries the upload.
+            return client.audio.translations.create(
+                file=(filename, file),  # Stream the file handle instead of reading it all into memory.
+                model="whisper-large-v3",  # Using the multilingual model
+                response_format="verbose_json",
+                temperature=0.0
+            )
+
+        translation = get_scheduler().timed_call("transcribe_audio", "whisper-large-v3", request)
+    # Use model_dump() instead of dict() to avoid deprecation warnings.
+    translation_dict = translation.model_dump()
+    segments = translation_dict.get("segments")
+    if not (segments and isinstance(segments, list)):
+        full_text = translation_dict.get("text", "").strip()
+        sentences = re.split(r'(?<=[.!?])\s+', full_text)
+        segment_duration = assumed_duration / len(sentences)
+        segments = [
+            {"start": round(i * segment_duration, 2), "end": round((i + 1) * segment_duration, 2), "text": sentence}
+            for i, sentence in enumerate(sentences)
+        ]
+    return {"text": translation_dict.get("text", ""), "segments": segments}
+
+def call_chat_translation(text, language=DEFAULT_LANGUAGE):
+    """
+    Calls the Groq chat endpoint to translate text into language (English by default).
+    The assistant is instructed to strictly return only the translation; if unable to
+    translate, it returns the original text. Results are served from and stored to the
+    shared on-disk translation cache.
+    """
+    system_prompt = translation_system_prompt(language)
+    cache = get_translation_cache()
+    cached = cache.get(text, TRANSLATION_MODEL, system_prompt, TRANSLATION_TEMPERATURE)
+    if cached is not None:
+        return cached
+    client = get_groq_client()
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Translate the following text to {language}: {text}"}
+    ]
+
+    def request(span):
+        span.bytes = len(text.encode("utf-8"))
+        chat_completion = client.chat.completions.create(
+            messages=messages,
+            model=TRANSLATION_MODEL,
+            temperature=TRANSLATION_TEMPERATURE,
+            max_completion_tokens=1024,
+            top_p=1,
+            stop=None,
+            stream=False
+        )
+        span.record_usage(chat_completion.usage)
+        return chat_completion
+
+    chat_completion = get_scheduler().timed_call(
+        "call_chat_translation", TRANSLATION_MODEL, request,
+        estimated_tokens=2 * estimate_tokens(system_prompt + text),
+    )
+    translated_text = chat_completion.choices[0].message.content.strip()
+    cache.put(text, TRANSLATION_MODEL, system_prompt, TRANSLATION_TEMPERATURE, translated_text)
+    return translated_text
+
+def call_batch_translation(texts, language=DEFAULT_LANGUAGE):
+    """
+    Translates several texts into language with a single chat completion using numbered JSON
+    input and output. Returns a dict mapping each 1-based id to its translated text. Ids that
+    are missing or malformed in the model's response are simply absent from the result.
+    """
+    client = get_groq_client()
+    payload = {"segments": [{"id": i + 1, "text": text} for i, text in enumerate(texts)]}
+    messages = [
+        {"role": "system", "content": batch_system_prompt(language)},
+        {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}
+    ]
+
+    def request(span):
+        span.bytes = sum(len(t.encode("utf-8")) for t in texts)
+        chat_completion = client.chat.completions.create(
+            messages=messages,
+            model=TRANSLATION_MODEL,
+            temperature=TRANSLATION_TEMPERATURE,
+            max_completion_tokens=max(1024, 2 * sum(estimate_tokens(t) for t in texts)),
+            top_p=1,
+            stop=None,
+            stream=False,
+            response_format={"type": "json_object"}
+        )
+        span.record_usage(chat_completion.usage)
+        return chat_completion
+
+    chat_completion = get_scheduler().timed_call(
+        "call_batch_translation", TRANSLATION_MODEL, request,
+        estimated_tokens=3 * sum(estimate_tokens(t) for t in texts),
+    )
+    return parse_batch_response(chat_completion.choices[0].message.content, len(texts))
+
+def parse_batch_response(content, expected_count):
+    """Parses a batched translation response into {id: text}, skipping anything malformed."""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return {}
+    items = data.get("translations") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return {}
+    results = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            item_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        text = item.get("text")
+        if 1 <= item_id <= expected_count and isinstance(text, str) and text.strip():
+            results[item_id] = text.strip()
+    return results
+
+def translate_segments(segments, translate_fn, max_workers=DEFAULT_MAX_WORKERS, on_partial=None):
+    """
+    Translates the text of every segment concurrently using a bounded thread pool.
+    Results are returned in the original segment order. A segment whose translation
+    raises keeps its original text and is reported in the failures list instead of
+    aborting the whole job.
+    When on_partial is given, translate_fn must be a streaming translator accepting an
+    on_partial callback; on_partial(index, text) then receives each segment's text so far.
+    Returns a tuple of (translated_segments, failures), where each failure is a dict
+    with the segment index, its original text and the error message.
+    """
+    translated_segments = [None] * len(segments)
+    failures = []
+    if not segments:
+        return translated_segments, failures
+
+    def submit(executor, i, text):
+        if on_partial is None:
+            return executor.submit(translate_fn, text)
+        return executor.submit(translate_fn, text, on_partial=lambda partial: on_partial(i, partial))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(segments)))) as executor:
+        futures = {
+            submit(executor, i, seg.get("text", "")): i
+            for i, seg in enumerate(segments)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            seg = dict(segments[i])
+            try:
+                seg["text"] = future.result()
+            except Exception as e:
+                failures.append({"index": i, "text": seg.get("text", ""), "error": str(e)})
+            translated_segments[i] = seg
+
+    failures.sort(key=lambda f: f["index"])
+    return translated_segments, failures
+
+def translate_segments_batched(segments, translate_fn, batch_fn=call_batch_translation,
+                               token_budget=DEFAULT_BATCH_TOKEN_BUDGET, max_workers=DEFAULT_MAX_WORKERS,
+                               use_cache=True, language=DEFAULT_LANGUAGE):
+    """
+    Translates segments into language by packing many of them into each request with batch_fn.
+    For languages other than the default, batch_fn and translate_fn are called with a language keyword.
+    Segments already in the translation cache are filled in locally and repeated texts
+    are only sent once. Batches are sent concurrently, and any segment that comes back
+    missing or malformed (or whose whole batch fails) is retried individually with translate_fn.
+    Returns (translated_segments, failures) in the same shape as translate_segments.
+    """
+    translated_segments = [dict(seg) for seg in segments]
+    if not segments:
+        return translated_segments, []
+
+    cache = get_translation_cache() if use_cache else None
+    prompt = batch_system_prompt(language)
+    batch_fn = for_language(batch_fn, language)
+    translate_fn = for_language(translate_fn, language)
+    pending = []
+    first_index = {}
+    duplicate_of = {}
+    for i, seg in enumerate(segments):
+        text = seg.get("text", "")
+        if text in first_index:
+            duplicate_of[i] = first_index[text]
+            continue
+        first_index[text] = i
+        cached = cache.get(text, TRANSLATION_MODEL, prompt, TRANSLATION_TEMPERATURE) if cache else None
+        if cached is None:
+            pending.append(i)
+        else:
+            translated_segments[i]["text"] = cached
+
+    batches = [[pending[j] for j in batch] for batch in pack_batches([segments[i] for i in pending], token_budget)]
+    retry_indices = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches) or 1))) as executor:
+        futures = {
+            executor.submit(batch_fn, [segments[i].get("text", "") for i in batch]): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                results = future.result()
+            except Exception:
+                results = {}
+            for position, i in enumerate(batch):
+                text = results.get(position + 1)
+                if text is None:
+                    retry_indices.append(i)
+                    continue
+                translated_segments[i]["text"] = text
+                if cache:
+                    cache.put(segments[i].get("text", ""), TRANSLATION_MODEL, prompt, TRANSLATION_TEMPERATURE, text)
+
+    # Fall back to one request per segment for anything the batches did not cover.
+    retry_indices.sort()
+    retried, retry_failures = translate_segments(
+        [segments[i] for i in retry_indices], translate_fn, max_workers
+    )
+    for i, seg in zip(retry_indices, retried):
+        translated_segments[i] = seg
+    failures = [dict(f, index=retry_indices[f["index"]]) for f in retry_failures]
+
+    failed = {f["index"]: f for f in failures}
+    for j, i in duplicate_of.items():
+        translated_segments[j]["text"] = translated_segments[i]["text"]
+        if i in failed:
+            failures.append(dict(failed[i], index=j))
+    failures.sort(key=lambda f: f["index"])
+    return translated_segments, failures
+
+def translate_segments_multi(segments, translate_fn, languages, batch=True, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Translates one transcription into several languages concurrently, each through the same
+    batching and caching path as a single-language run. translate_fn is called with a language
+    keyword for every language other than the default.
+    Returns {language: (translated_segments, failures)}.
+    """
+    def translate(language):
+        if batch:
+            return translate_segments_batched(segments, translate_fn, max_workers=max_workers, language=language)
+        return translate_segments(segments, for_language(translate_fn, language), max_workers)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(languages))) as executor:
+        futures = {language: executor.submit(translate, language) for language in languages}
+        return {language: future.result() for language, future in futures.items()}
@@ -1,87 +1,178 @@
 #!/usr/bin/env python3
 import os
 import json
-import re
 import sys
-from groq import Groq  # Ensure groq is installed and configured correctly
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from metrics import get_metrics
+from chunked_transcription import transcribe_audio_chunked
+from translation_cache import get_translation_cache
+from voice_activity import VAD_ENABLED, with_voice_activity_detection
+from translation_pipeline import call_chat_translation, transcribe_audio, translate_segments, translate_segments_batched
 
-def transcribe_audio(filename, assumed_duration=90.0):
-    client = Groq()
-    with open(filename, "rb") as file:
-        translation = client.audio.translations.create(
-            file=(filename, file.read()),
-            model="whisper-large-v3",  # Using the multilingual model
-            response_format="verbose_json",
-            temperature=0.0
-        )
-    # Use model_dump() instead of dict() to avoid deprecation warnings.
-    translation_dict = translation.model_dump()
-    segments = translation_dict.get("segments")
-    if segments and isinstance(segments, list) and len(segments) > 0:
-        pass  # Use the returned timestamped segments.
-    else:
-        full_text = translation_dict.get("text", "").strip()
-        sentences = re.split(r'(?<=[.!?])\s+', full_text)
-        num_sentences = len(sentences)
-        if num_sentences == 0:
-            segments = []
-        else:
-            segment_duration = assumed_duration / num_sentences
-            segments = []
-            for i, sentence in enumerate(sentences):
-                segments.append({
-                    "start": round(i * segment_duration, 2),
-                    "end": round((i + 1) * segment_duration, 2),
-                    "text": sentence
-                })
-        translation_dict["segments"] = segments
-    return translation_dict
+# Extensions picked up when a directory is given in batch mode.
+AUDIO_EXTENSIONS = (".mp3", ".mp4", ".mpeg", ".mpga", ".m4a", ".wav", ".webm", ".ogg", ".flac")
 
-def call_chat_translation(text):
+def translate_file(audio_file, batch=False):
     """
-    Calls the Groq chat endpoint to translate the provided text to English.
-    The assistant is instructed to strictly return only the English translation.
-    If unable to translate, it should return the original text.
+    Transcribes and translates one audio file.
+    Returns (rows, failures) where each row has start, end, original and translated text.
+    Rows whose translation failed keep the original text as "translated" and carry an "error".
     """
-    client = Groq()
-    messages = [
-        {"role": "system", "content": "You are a translation assistant. Your task is to translate the provided text strictly into English and output only the translated text. If you are unable to translate, return the original text as is."},
-        {"role": "user", "content": f"Translate the following text to English: {text}"}
+    # Upload only speech regions unless VAD_ENABLED=0; timestamps stay in original audio time.
+    transcribe_fn = with_voice_activity_detection(transcribe_audio) if VAD_ENABLED else transcribe_audio
+    result = transcribe_audio_chunked(audio_file, transcribe_fn)
+    segments = result.get("segments", [])
+    if batch:
+        translated_segments, failures = translate_segments_batched(segments, call_chat_translation)
+    else:
+        translated_segments, failures = translate_segments(segments, call_chat_translation)
+    rows = [
+        {"start": seg.get("start"), "end": seg.get("end"), "original": seg.get("text", ""), "translated": translated.get("text", "")}
+        for seg, translated in zip(segments, translated_segments)
     ]
-    chat_completion = client.chat.completions.create(
-        messages=messages,
-        model="llama-3.3-70b-versatile",
-        temperature=0.5,
-        max_completion_tokens=1024,
-        top_p=1,
-        stop=None,
-        stream=False
-    )
-    return chat_completion.choices[0].message.content.strip()
+    for failure in failures:
+        rows[failure["index"]]["error"] = failure["error"]
+    return rows, failures
+
+def list_input_files(path):
+    """
+    Returns (root, files) for batch mode. path may be a directory (searched recursively for
+    audio files) or a manifest: a text file with one audio path per line, or JSONL lines
+    with a "path" field. Relative manifest entries are resolved against the manifest's folder.
+    """
+    if os.path.isdir(path):
+        files = []
+        for folder, _, names in os.walk(path):
+            files.extend(os.path.join(folder, name) for name in names if name.lower().endswith(AUDIO_EXTENSIONS))
+        return path, sorted(files)
+    root = os.path.dirname(os.path.abspath(path))
+    files = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line)["path"] if line.startswith("{") else line
+            files.append(entry if os.path.isabs(entry) else os.path.join(root, entry))
+    return root, files
+
+def output_path_for(audio_file, root, output_dir):
+    """Mirrors the input layout under output_dir, so files with the same name never collide."""
+    relative = os.path.relpath(os.path.abspath(audio_file), os.path.abspath(root))
+    if relative.startswith(".."):
+        relative = os.path.basename(audio_file)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + ".jsonl")
+
+def process_batch(files, root, output_dir, workers, batch=False):
+    """
+    Translates many files concurrently, writing one JSONL file per input.
+    Files whose output already exists are skipped, so an interrupted run can be resumed;
+    outputs are written to a temporary name first so a crash never leaves a partial file.
+    A file with untranslated segments is left under its temporary name (rows marked with an
+    "error") and counted as incomplete, so the next run retries it.
+    Returns a dict with the number of files done, skipped, incomplete and failed.
+    """
+    counts = {"done": 0, "skipped": 0, "incomplete": 0, "failed": 0}
+    jobs = []
+    for audio_file in files:
+        output_path = output_path_for(audio_file, root, output_dir)
+        if os.path.exists(output_path):
+            counts["skipped"] += 1
+        else:
+            jobs.append((audio_file, output_path))
+    
+    def run(job):
+        audio_file, output_path = job
+        rows, failures = translate_file(audio_file, batch)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        temp_path = output_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        if not failures:
+            os.replace(temp_path, output_path)
+        return len(rows), len(failures)
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(run, job): job[0] for job in jobs}
+        for future in as_completed(futures):
+            audio_file = futures[future]
+            try:
+                segment_count, failure_count = future.result()
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"Error: '{audio_file}' failed: {e}", file=sys.stderr)
+                continue
+            if failure_count:
+                counts["incomplete"] += 1
+                print(f"Incomplete: '{audio_file}': {failure_count} of {segment_count} segments untranslated; "
+                      f"kept as .tmp and retried on the next run.", file=sys.stderr)
+                continue
+            counts["done"] += 1
+            print(f"Translated '{audio_file}': {segment_count} segments.")
+    return counts
+
+def print_summary(metrics_path=None):
+    cache_stats = get_translation_cache().stats()
+    print(f"\nTranslation cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} entries.")
+    
+    metrics = get_metrics()
+    for stage in metrics.summary():
+        print(f"{stage['stage']}: {stage['count']} calls, {stage['errors']} errors, "
+              f"p50 {stage['p50_s']:.2f}s, p95 {stage['p95_s']:.2f}s, {stage['bytes']} bytes, "
+              f"{stage['prompt_tokens'] + stage['completion_tokens']} tokens")
+    if metrics_path:
+        with open(metrics_path, "w") as f:
+            f.write(metrics.export_prometheus() if metrics_path.endswith(".prom") else metrics.export_json())
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python translation_test.py <audio_file_path>")
+    parser = argparse.ArgumentParser(
+        description="Transcribe and translate an audio file, or a directory/manifest of files in batch mode."
+    )
+    parser.add_argument("input", help="Audio file, directory of audio files, or manifest file (use --output-dir for the latter two).")
+    parser.add_argument("--batch", action="store_true", help="Pack many segments into each translation request.")
+    parser.add_argument("--output-dir", help="Batch mode: write one JSONL file per input here, skipping inputs already done.")
+    parser.add_argument("--workers", type=int, default=4, help="Batch mode: number of files processed in parallel.")
+    parser.add_argument("--metrics", help="Write stage metrics to this file (.prom for Prometheus text, otherwise JSON).")
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.input):
+        print(f"Error: Audio file '{args.input}' not found!")
         sys.exit(1)
     
-    audio_file = sys.argv[1]
-    if not os.path.exists(audio_file):
-        print(f"Error: Audio file '{audio_file}' not found!")
+    if args.output_dir:
+        if os.path.isfile(args.input) and args.input.lower().endswith(AUDIO_EXTENSIONS):
+            root, files = os.path.dirname(args.input), [args.input]
+        else:
+            root, files = list_input_files(args.input)
+        print(f"Processing {len(files)} files with {args.workers} workers into '{args.output_dir}'...\n")
+        counts = process_batch(files, root, args.output_dir, args.workers, args.batch)
+        print(f"\nDone: {counts['done']} translated, {counts['skipped']} skipped (already done), "
+              f"{counts['incomplete']} incomplete, {counts['failed']} failed.")
+        print_summary(args.metrics)
+        sys.exit(1 if counts["failed"] or counts["incomplete"] else 0)
+    
+    if os.path.isdir(args.input):
+        print("Error: a directory needs --output-dir for batch mode.")
         sys.exit(1)
     
+    audio_file = args.input
     print(f"Processing transcription for '{audio_file}'...\n")
-    result = transcribe_audio(audio_file)
-    segments = result.get("segments", [])
+    rows, failures = translate_file(audio_file, args.batch)
     
-    if not segments:
+    if not rows:
         print("No segments found.")
         sys.exit(1)
     
     print("Translated Text for All Segments:")
-    for i, seg in enumerate(segments):
-        original_text = seg.get("text", "")
-        translated_text = call_chat_translation(original_text)
-        print(f"Segment {i+1}: {translated_text}")
+    for i, row in enumerate(rows):
+        print(f"Segment {i+1}: {row['translated']}")
+    
+    for failure in failures:
+        print(f"Warning: segment {failure['index']+1} was not translated: {failure['error']}", file=sys.stderr)
+    
+    print_summary(args.metrics)
 
 if __name__ == '__main__':
     main()
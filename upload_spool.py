@@ -0,0 +1,82 @@
+import os
+import hashlib
+import tempfile
+import threading
+
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", "upload_spool")
+# Total size of spooled uploads kept on disk before least recently used ones are evicted.
+UPLOAD_SPOOL_MAX_BYTES = int(os.getenv("UPLOAD_SPOOL_MAX_BYTES", str(5 * 1024 ** 3)))
+# Uploads are copied to disk this many bytes at a time.
+SPOOL_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Spooled path per upload ID. This module survives Streamlit reruns, so an unchanged upload is
+# recognized without reading it again.
+_spooled = {}
+_spooled_lock = threading.Lock()
+
+def spool_upload(uploaded_file, spool_dir=UPLOAD_SPOOL_DIR, max_bytes=UPLOAD_SPOOL_MAX_BYTES,
+                 chunk_bytes=SPOOL_CHUNK_BYTES):
+    """
+    Returns a path on disk holding the contents of a Streamlit upload.
+    The upload is copied in chunks while being hashed and stored as <sha256><ext>, so the same
+    content is stored once however many sessions upload it, and each session reads its own
+    immutable file. Reruns with the same upload reuse the path without touching the data.
+    """
+    upload_id = getattr(uploaded_file, "file_id", None) or id(uploaded_file)
+    with _spooled_lock:
+        path = _spooled.get(upload_id)
+    if path and os.path.exists(path):
+        os.utime(path)  # Mark as recently used for eviction.
+        return path
+
+    os.makedirs(spool_dir, exist_ok=True)
+    extension = os.path.splitext(getattr(uploaded_file, "name", ""))[1].lower() or ".bin"
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=spool_dir, suffix=".part")
+    try:
+        uploaded_file.seek(0)
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = uploaded_file.read(chunk_bytes)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        path = os.path.join(spool_dir, digest.hexdigest() + extension)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    with _spooled_lock:
+        _spooled[upload_id] = path
+    evict_uploads(spool_dir, max_bytes, keep=path)
+    return path
+
+def evict_uploads(spool_dir=UPLOAD_SPOOL_DIR, max_bytes=UPLOAD_SPOOL_MAX_BYTES, keep=None):
+    """Deletes least recently used spooled uploads until the spool fits within max_bytes."""
+    entries = []
+    for name in os.listdir(spool_dir):
+        if name.endswith(".part"):
+            continue
+        path = os.path.join(spool_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
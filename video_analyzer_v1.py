@@ -1,11 +1,17 @@
 import os
 import cv2
-import base64
 import time
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from dotenv import load_dotenv
-from openai import OpenAI
-from groq import Groq
+from api_clients import get_groq_client, get_openai_client
+from metrics import render_metrics_panel
+from rate_limiter import get_scheduler
+from frame_preprocessing import encode_frame, frame_hash, is_near_duplicate
+from frame_sampling import compute_difference_signal, iter_preview_frames, iter_sampled_frames, select_scene_changes
+from upload_spool import spool_upload
+from vision_batching import MAX_FRAMES_PER_REQUEST, build_frame_messages, frame_answers, run_vision_benchmark
 
 # Load API key
 load_dotenv()
@@ -16,9 +22,12 @@ if not openai_api_key and not groq_api_key:
     st.error("Please set at least one API key (OPENAI_API_KEY or GROQ_API_KEY) in the environment variables.")
     st.stop()
 
-# Initialize AI clients
-openai_client = OpenAI(api_key=openai_api_key) if openai_api_key else None
-groq_client = Groq(api_key=groq_api_key) if groq_api_key else None
+# Maximum number of vision requests in flight at once
+vision_max_workers = int(os.getenv("VISION_MAX_WORKERS", "4"))
+
+# Initialize AI clients (shared across reruns and sessions)
+openai_client = get_openai_client(openai_api_key) if openai_api_key else None
+groq_client = get_groq_client(groq_api_key) if groq_api_key else None
 
 # Streamlit UI
 st.title("AI Inference Demo")
@@ -29,9 +38,8 @@ video_option = st.radio("Do you want to upload a video or use the demo video?",
 if video_option == "Upload Your Own Video":
     uploaded_file = st.file_uploader("Upload your video file", type=["mp4", "avi", "mov", "mkv"])
     if uploaded_file is not None:
-        video_path = "uploaded_video.mp4"
-        with open(video_path, "wb") as f:
-            f.write(uploaded_file.read())
+        # Spooled to disk in chunks under a content-hash name; reruns reuse the spooled file.
+        video_path = spool_upload(uploaded_file)
     else:
         st.stop()
 else:
@@ -43,9 +51,89 @@ else:
 # AI model selection
 ai_choice = st.selectbox("Choose AI Model:", ["Slow Inference (OpenAI GPT-4o-mini)", "Fast Inference (Groq Llama-3.2-11b-vision-preview)"])
 
+# Frame sampling: evenly spaced, or concentrated on scene changes under the same call budget.
+sampling_mode = st.radio("Frame sampling", ("Evenly spaced", "Scene changes (adaptive)"), horizontal=True)
+frame_budget = st.number_input("Frames to analyze", min_value=1, max_value=50, value=10)
+
+# Preview playback is decoupled from analysis: only sampled frames are decoded unless a preview is requested.
+show_preview = st.checkbox("Play video preview during analysis", value=False)
+preview_fps = st.slider("Preview frame rate", min_value=1, max_value=30, value=5) if show_preview else 0
+
+# Frame preprocessing: smaller, more compressed images and skipping frames of an unchanged scene.
+with st.expander("Frame preprocessing"):
+    max_side = st.slider("Maximum image side (pixels)", min_value=256, max_value=2048, value=768, step=64)
+    jpeg_quality = st.slider("JPEG quality", min_value=30, max_value=95, value=70)
+    duplicate_threshold = st.slider(
+        "Reuse previous analysis when frames differ in at most this many hash bits (0 disables)",
+        min_value=0, max_value=20, value=6
+    )
+
+# Vision model and client behind each choice.
+vision_models = {
+    "Slow Inference (OpenAI GPT-4o-mini)": ("gpt-4o-mini", openai_client),
+    "Fast Inference (Groq Llama-3.2-11b-vision-preview)": ("llama-3.2-11b-vision-preview", groq_client),
+}
+
+# Several frames can share one request, amortizing the round trip; answers are mapped back per frame.
+frames_per_request = st.number_input(
+    "Frames per request", min_value=1, max_value=MAX_FRAMES_PER_REQUEST, value=1,
+    help="Frames packed into one multimodal request. Frames the model does not answer are retried one by one."
+)
+
+common_prompt = "Describe the scene in exactly 10 words or fewer. Avoid extra details. Focus only on pedestrians, number of vehicles, traffic signals and its colors"
+
+# Send one request with one or more JPEG frames to a model. Returns one answer per frame (None if
+# missing), the round-trip time of the API call itself and the time spent waiting on the rate
+# limiter, which is recorded as its own metric stage.
+# Benchmark requests pass record_metrics=False so they stay out of the performance metrics.
+def request_frames(model, jpegs, prompt=common_prompt, record_metrics=True):
+    client = {name: client for name, client in vision_models.values()}[model]
+    messages = build_frame_messages(jpegs, prompt)
+    # Several frames are answered as JSON, so ask for JSON mode.
+    extra = {"response_format": {"type": "json_object"}} if len(jpegs) > 1 else {}
+    stage = f"vision:{model}" if len(jpegs) == 1 else f"vision:{model}:batch"
+    
+    def send(span):
+        span.bytes = sum(len(jpeg) for jpeg in jpegs)
+        response = client.chat.completions.create(model=model, messages=messages, **extra)
+        span.record_usage(response.usage)
+        return response
+    
+    timing = {}
+    response = get_scheduler().timed_call(
+        stage, model, send, estimated_tokens=1500 * len(jpegs), timing=timing, record=record_metrics
+    )
+    return frame_answers(response.choices[0].message.content, len(jpegs)), timing["round_trip"], timing["queued"]
+
+# Send frames to the selected model. Returns their descriptions, the API round-trip time of every
+# request made (the batch, then any one-by-one retries), the time spent queued and the payload size.
+def analyze_frames(frames, prompt):
+    model = vision_models[ai_choice][0]
+    jpegs = [encode_frame(frame, max_side, jpeg_quality) for frame in frames]
+    answers, round_trip, queued = request_frames(model, jpegs, prompt)
+    round_trips = [round_trip]
+    for i, answer in enumerate(answers):
+        if answer is None:
+            retry_answers, round_trip, retry_queued = request_frames(model, [jpegs[i]], prompt)
+            answers[i] = retry_answers[0]
+            round_trips.append(round_trip)
+            queued += retry_queued
+    return answers, round_trips, queued, sum(len(jpeg) for jpeg in jpegs)
+
+# Pick the frames to analyze: evenly spaced, or scene changes under the same budget.
+def select_frame_indices(video, fps, total_frames):
+    if sampling_mode == "Scene changes (adaptive)":
+        with st.spinner("Detecting scene changes..."):
+            signal_indices, signal_scores = compute_difference_signal(video, fps)
+            return select_scene_changes(signal_indices, signal_scores, frame_budget, min_gap_frames=int(fps / 2))
+    return [int(i * total_frames / frame_budget) for i in range(frame_budget)]  # Select frames evenly
+
 if st.button("Run AI Analysis"):
+    if not vision_models[ai_choice][1]:
+        st.error("Invalid AI selection or missing API key.")
+        st.stop()
+    
     st.write("### AI Analysis Output:")
-    common_prompt = "Describe the scene in exactly 10 words or fewer. Avoid extra details. Focus only on pedestrians, number of vehicles, traffic signals and its colors"
     
     avg_response_time_placeholder = st.empty()
     cols = st.columns([3, 2])  # Video on left, analysis on right
@@ -57,71 +145,127 @@ if st.button("Run AI Analysis"):
     analysis_results = {}
     
     video = cv2.VideoCapture(video_path)
-    fps = int(video.get(cv2.CAP_PROP_FPS))
+    fps = video.get(cv2.CAP_PROP_FPS) or 30
     total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-    frame_indices = [int(i * total_frames / 10) for i in range(10)]  # Select 10 frames evenly
+    frame_indices = select_frame_indices(video, fps, total_frames)
     
-    frame_index = 0
-    processed_count = 0
+    if show_preview:
+        frames = iter_preview_frames(video, frame_indices, preview_fps, fps)
+    else:
+        # Seek straight to the sampled frames; nothing else is decoded.
+        frames = ((frame_index, frame, True) for frame_index, frame in iter_sampled_frames(video, frame_indices))
     
-    while video.isOpened():
-        success, frame = video.read()
-        if not success:
-            break
-        
-        # Rotate frame 90 degrees to the right
-        frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-        
-        # Display current frame
-        video_placeholder.image(frame, channels="BGR")
-        
-        if frame_index in frame_indices and processed_count < 10:
-            # Encode and send frame to AI model
-            _, buffer = cv2.imencode(".jpg", frame)
-            base64_image = base64.b64encode(buffer).decode("utf-8")
-            
-            start_time = time.time()
-            
-            if ai_choice == "Slow Inference (OpenAI GPT-4o-mini)" and openai_client:
-                response = openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "user", "content": [
-                            {"type": "text", "text": common_prompt},
-                            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}},
-                        ]},
-                    ],
+    # Sampled frames are analyzed concurrently while decoding continues; results are shown as they arrive.
+    frame_numbers = {frame_index: n + 1 for n, frame_index in enumerate(sorted(set(frame_indices)))}
+    pending = {}
+    # Frames waiting to fill the next multi-frame request.
+    batch = []
+    # Near-duplicate frames are not sent; they reuse the analysis of the frame they match.
+    analysis_contents = {}
+    reused_from = {}
+    last_hash = None
+    last_analyzed_index = None
+    sent_bytes = 0
+    analyzed_frames = 0
+    queued_time = 0.0
+    
+    def show_results():
+        for frame_index, source_index in reused_from.items():
+            if source_index in analysis_contents:
+                analysis_results[frame_index] = (
+                    f"Frame {frame_numbers[frame_index]}: {analysis_contents[source_index]} "
+                    f"(reused from frame {frame_numbers[source_index]}, scene unchanged)"
                 )
-                content = response.choices[0].message.content
-            
-            elif ai_choice == "Fast Inference (Groq Llama-3.2-11b-vision-preview)" and groq_client:
-                response = groq_client.chat.completions.create(
-                    model="llama-3.2-11b-vision-preview",
-                    messages=[
-                        {"role": "user", "content": [
-                            {"type": "text", "text": common_prompt},
-                            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}},
-                        ]},
-                    ],
+        analysis_placeholder.markdown("\n\n".join(analysis_results[i] for i in sorted(analysis_results)))
+    
+    def submit_batch(executor):
+        pending[executor.submit(analyze_frames, [frame for _, frame in batch], common_prompt)] = [i for i, _ in batch]
+        batch.clear()
+    
+    def collect(future):
+        global sent_bytes, analyzed_frames, queued_time
+        batch_indices = pending.pop(future)
+        try:
+            contents, round_trips, queued, payload_bytes = future.result()
+        except Exception as e:
+            for frame_index in batch_indices:
+                analysis_results[frame_index] = f"Frame {frame_numbers[frame_index]}: analysis failed ({e})"
+        else:
+            # One response time per request: the API round trip, without rate-limit queueing.
+            response_times.extend(round_trips)
+            response_time = round_trips[0]
+            queued_time += queued
+            sent_bytes += payload_bytes
+            analyzed_frames += len(batch_indices)
+            shared = f", shared by {len(batch_indices)} frames" if len(batch_indices) > 1 else ""
+            for frame_index, content in zip(batch_indices, contents):
+                analysis_contents[frame_index] = content
+                analysis_results[frame_index] = (
+                    f"Frame {frame_numbers[frame_index]}: {content} (Response Time: {response_time:.2f}s{shared})"
                 )
-                content = response.choices[0].message.content
-            else:
-                st.error("Invalid AI selection or missing API key.")
-                break
-            
-            end_time = time.time()
-            response_time = end_time - start_time
-            response_times.append(response_time)
+        show_results()
+    
+    analysis_start = time.time()
+    with ThreadPoolExecutor(max_workers=vision_max_workers) as executor:
+        for frame_index, frame, is_sampled in frames:
+            # Display current frame
+            video_placeholder.image(frame, channels="BGR")
             
-            analysis_results[frame_index] = f"Frame {processed_count + 1}: {content} (Response Time: {response_time:.2f}s)"
-            processed_count += 1
+            if is_sampled:
+                current_hash = frame_hash(frame) if duplicate_threshold else None
+                if is_near_duplicate(current_hash, last_hash, duplicate_threshold):
+                    reused_from[frame_index] = last_analyzed_index
+                    show_results()
+                else:
+                    batch.append((frame_index, frame))
+                    if len(batch) >= frames_per_request:
+                        submit_batch(executor)
+                    last_hash = current_hash
+                    last_analyzed_index = frame_index
+            for future in [f for f in pending if f.done()]:
+                collect(future)
+        if batch:
+            submit_batch(executor)
         
-        # Show analysis for the current frame if it was processed
-        if frame_index in analysis_results:
-            analysis_placeholder.markdown(analysis_results[frame_index])
-        
-        frame_index += 1
+        for future in as_completed(list(pending)):
+            collect(future)
+    analysis_time = time.time() - analysis_start
     
     video.release()
-    avg_response_time = sum(response_times) / len(response_times) if response_times else 0
-    avg_response_time_placeholder.markdown(f"#### Average Processing Time Per Frame: {avg_response_time:.2f} seconds")
+    # Request time is amortized over the frames that shared the request.
+    avg_response_time = sum(response_times) / analyzed_frames if analyzed_frames else 0
+    avg_response_time_placeholder.markdown(
+        f"#### Average Processing Time Per Frame: {avg_response_time:.2f} seconds (total analysis time: {analysis_time:.2f} seconds)"
+    )
+    st.caption(
+        f"Sent {len(response_times)} requests for {analyzed_frames} frames ({sent_bytes / 1024:.0f} KB of images); "
+        f"skipped {len(reused_from)} near-duplicate frames; {queued_time:.2f}s spent waiting on rate limits."
+    )
+
+# Runs the same sampled frames through every configured provider at several batch sizes.
+with st.expander("Provider benchmark"):
+    benchmark_sizes = st.multiselect(
+        "Frames per request to compare", list(range(1, MAX_FRAMES_PER_REQUEST + 1)), default=[1, 2, 4]
+    )
+    available_models = [model for model, client in vision_models.values() if client]
+    st.caption(
+        f"Providers with an API key: {', '.join(available_models)}. Each combination sends every frame once. "
+        "Latencies are API round trips; wall time and throughput also include rate-limit waits."
+    )
+    if st.button("Run benchmark") and benchmark_sizes:
+        video = cv2.VideoCapture(video_path)
+        fps = video.get(cv2.CAP_PROP_FPS) or 30
+        total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_indices = select_frame_indices(video, fps, total_frames)
+        # Frames are encoded once up front so only request round trips are measured.
+        jpegs = [encode_frame(frame, max_side, jpeg_quality) for _, frame in iter_sampled_frames(video, frame_indices)]
+        video.release()
+        with st.spinner(f"Benchmarking {len(jpegs)} frames..."):
+            rows = run_vision_benchmark(
+                jpegs, partial(request_frames, record_metrics=False), available_models, sorted(benchmark_sizes),
+                vision_max_workers,
+            )
+        st.dataframe(rows)
+
+# Per-stage latency, bytes and token metrics for this server process, with exports.
+render_metrics_panel(st)
@@ -1,9 +1,42 @@
 import os
 import json
-import re
+import time
 import streamlit as st
 import yt_dlp
-from groq import Groq  # Ensure groq is installed and configured correctly
+import hashlib
+import uuid
+from api_clients import get_groq_client
+from metrics import get_metrics, render_metrics_panel, timed
+from rate_limiter import get_scheduler
+from audio_cache import get_audio_metadata, get_cached_audio
+from audio_profiles import DEFAULT_AUDIO_PROFILE, convert_audio
+from caption_pipeline import (
+    LiveCaptionRun, captions_url, compact_segments, start_caption_pipeline, start_live_caption_pipeline, write_captions,
+)
+from job_queue import JobQueue
+from voice_activity import VAD_ENABLED, with_voice_activity_detection
+from result_store import get_result_store, prompt_version
+from translation_cache import get_translation_cache
+from translation_pipeline import (
+    DEFAULT_LANGUAGE, TRANSLATION_LANGUAGES, TRANSLATION_MODEL, TRANSLATION_TEMPERATURE, call_chat_translation,
+    estimate_tokens, transcribe_audio, translation_system_prompt,
+)
+
+# Player used in live mode. Unlike components.html it reports the playhead back to Python,
+# so captioning can be kept just ahead of it.
+LIVE_PLAYER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "live_player")
+live_player = st.components.v1.declare_component("live_player", path=LIVE_PLAYER_DIR)
+# Caption lookup shared with the live player; the embedded player inlines it.
+with open(os.path.join(LIVE_PLAYER_DIR, "caption_lookup.js"), encoding="utf-8") as f:
+    CAPTION_LOOKUP_JS = f.read()
+
+STOCK_VIDEO_URL = "https://www.youtube.com/watch?v=abFz6JgOMCk&list=PLs7zUO7VPyJ5DV1iBRgSw2uDl832n0bLg&index=1"
+# Languages offered for caption tracks.
+CAPTION_LANGUAGES = list(dict.fromkeys(
+    TRANSLATION_LANGUAGES + ["English", "Spanish", "French", "German", "Portuguese", "Hindi", "Japanese", "Chinese"]
+))
+# Set PREWARM_STOCK_VIDEO=0 to skip captioning the stock video at startup.
+PREWARM_STOCK_VIDEO = os.getenv("PREWARM_STOCK_VIDEO", "1") != "0"
 
 # Helper function to extract the YouTube video ID.
 def extract_video_id(url):
@@ -17,82 +50,200 @@ def extract_video_id(url):
     else:
         return ""
 
-# Download audio from the YouTube video using a unique filename based on the video ID.
-def download_audio(youtube_url):
-    video_id = extract_video_id(youtube_url)
-    output_path = f"audio_{video_id}.mp3"
-    # Remove any existing file to force a fresh download.
-    if os.path.exists(output_path):
-        os.remove(output_path)
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'extractaudio': True,
-        'audioformat': 'mp3',
-        'outtmpl': output_path,
-        'noplaylist': True,
-    }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([youtube_url])
+# Download audio from the YouTube video into the shared audio cache, keyed by the video ID and
+# extraction profile. A complete cached copy is reused without touching the network.
+# The speech profile re-encodes to small mono 16 kHz audio before it is cached and uploaded.
+def download_audio(youtube_url, profile=DEFAULT_AUDIO_PROFILE):
+    video_id = extract_video_id(youtube_url) or hashlib.sha1(youtube_url.encode("utf-8")).hexdigest()[:16]
+
+    def fetch(output_path):
+        source_path = f"{output_path}.source"
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': source_path,
+            'noplaylist': True,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            ydl.download([youtube_url])
+        try:
+            return convert_audio(source_path, output_path, profile)
+        finally:
+            if os.path.exists(source_path):
+                os.remove(source_path)
+
+    with timed("download_audio") as span:
+        output_path, _ = get_cached_audio(f"{video_id}_{profile}", fetch)
+        span.bytes = os.path.getsize(output_path)
     return output_path
 
-# Transcribe audio using Groq’s Whisper model.
-# If no timestamped segments are returned, split the full text into sentences with estimated timings.
-def transcribe_audio(filename, assumed_duration=90.0):
-    client = Groq()
-    with open(filename, "rb") as file:
-        translation = client.audio.translations.create(
-            file=(filename, file.read()),
-            model="whisper-large-v3",  # Using the multilingual model
-            response_format="verbose_json",
-            temperature=0.0
-        )
-    translation_dict = translation.dict()
-    segments = translation_dict.get("segments")
-    if segments and isinstance(segments, list) and len(segments) > 0:
-        pass  # Use the timestamped segments returned.
-    else:
-        full_text = translation_dict.get("text", "").strip()
-        sentences = re.split(r'(?<=[.!?])\s+', full_text)
-        num_sentences = len(sentences)
-        if num_sentences == 0:
-            segments = []
-        else:
-            segment_duration = assumed_duration / num_sentences
-            segments = []
-            for i, sentence in enumerate(sentences):
-                segments.append({
-                    "start": round(i * segment_duration, 2),
-                    "end": round((i + 1) * segment_duration, 2),
-                    "text": sentence
-                })
-    return {"text": translation_dict.get("text", ""), "segments": segments}
-
-# Call Groq's chat endpoint to translate text to English.
-def call_chat_translation(text):
-    client = Groq()
+# Streaming variant of call_chat_translation: tokens are consumed as they arrive and
+# on_partial(text_so_far) is called for each one, so captions can show up before the
+# translation is finished. Time to the first token is recorded as its own metrics stage.
+def call_chat_translation_stream(text, on_partial=None, language=DEFAULT_LANGUAGE):
+    system_prompt = translation_system_prompt(language)
+    cache = get_translation_cache()
+    cached = cache.get(text, TRANSLATION_MODEL, system_prompt, TRANSLATION_TEMPERATURE)
+    if cached is not None:
+        return cached
+    client = get_groq_client()
     messages = [
-        {
-            "role": "system", 
-            "content": "You are a translation assistant. Your task is to translate the provided text strictly into English and output only the translated text. If you are unable to translate, return the original text as is."
-        },
-        {
-            "role": "user", 
-            "content": f"Translate the following text to English: {text}"
-        }
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Translate the following text to {language}: {text}"}
     ]
-    chat_completion = client.chat.completions.create(
-        messages=messages,
-        model="llama-3.3-70b-versatile",
-        temperature=0.5,
-        max_completion_tokens=1024,
-        top_p=1,
-        stop=None,
-        stream=False
+    
+    def request(span):
+        # The whole stream is consumed inside the scheduled call, so it holds its concurrency slot
+        # until the last token and a failed stream is retried from the start.
+        span.bytes = len(text.encode("utf-8"))
+        start = time.perf_counter()
+        stream = client.chat.completions.create(
+            messages=messages,
+            model=TRANSLATION_MODEL,
+            temperature=TRANSLATION_TEMPERATURE,
+            max_completion_tokens=1024,
+            top_p=1,
+            stop=None,
+            stream=True
+        )
+        parts = []
+        usage = None
+        for chunk in stream:
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(x_groq, "usage", None) or getattr(chunk, "usage", None) or usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            if not parts:
+                get_metrics().observe("call_chat_translation_stream:first_token", time.perf_counter() - start)
+            parts.append(delta)
+            if on_partial:
+                on_partial("".join(parts).strip())
+        span.record_usage(usage)
+        return "".join(parts)
+    
+    content = get_scheduler().timed_call(
+        "call_chat_translation_stream", TRANSLATION_MODEL, request,
+        estimated_tokens=2 * estimate_tokens(system_prompt + text),
     )
-    return chat_completion.choices[0].message.content.strip()
+    translated_text = content.strip()
+    cache.put(text, TRANSLATION_MODEL, system_prompt, TRANSLATION_TEMPERATURE, translated_text)
+    return translated_text
+
+# Keep the final segments of a finished run in the shared result store. Runs with untranslated
+# segments are not stored, so those segments are retried the next time the video is requested.
+def store_result(video_id, languages):
+    def on_complete(progress):
+        if not progress["failures"]:
+            segments = [
+                {key: seg[key] for key in ("start", "end", "text", "translations") if key in seg}
+                for seg in progress["segments"]
+            ]
+            get_result_store().put(video_id, segments, version=prompt_version(languages))
+    return on_complete
+
+# Start one captioning job on a background worker: download the audio and start the pipeline, then
+# hand the running pipeline to the job queue, which polls it with poll_caption_run until it finishes,
+# so the worker is free for the next job. The captions file is named by the job ID.
+def run_caption_job(jobs, job):
+    job_id, options = job["job_id"], job["payload"]
+    video_id = extract_video_id(options["url"])
+    languages = options["languages"]
+    jobs.report(job_id, "download", 0.0, "Extracting audio from the video...")
+    audio_file = download_audio(options["url"])
+    audio_meta = get_audio_metadata(audio_file)
+    detail = ""
+    if audio_meta.get("source_bytes"):
+        detail = (
+            f"Audio profile '{audio_meta['profile']}': {audio_meta['bytes'] / 1e6:.1f} MB to upload "
+            f"instead of {audio_meta['source_bytes'] / 1e6:.1f} MB ({audio_meta['bytes_saved'] / 1e6:.1f} MB saved)."
+        )
+    jobs.report(job_id, "transcribe", 0.0, detail)
+    # Optionally upload only the speech regions; timestamps are mapped back to video time.
+    transcribe_fn = with_voice_activity_detection(transcribe_audio) if options.get("vad") else transcribe_audio
+    
+    # Every language is translated from this one transcription. Streaming produces only the
+    # primary language, so its result is stored under that language alone.
+    produced = languages[:1] if options["stream"] and not options["live"] else languages
+    on_complete = store_result(video_id, produced) if video_id else None
+    if options["live"]:
+        run = start_live_caption_pipeline(
+            job_id, audio_file, transcribe_fn, call_chat_translation, batch=options["batch"],
+            on_complete=on_complete, languages=languages,
+        )
+    else:
+        run = start_caption_pipeline(
+            job_id, audio_file, transcribe_fn,
+            call_chat_translation_stream if options["stream"] else call_chat_translation,
+            batch=options["batch"], stream=options["stream"], on_complete=on_complete, languages=languages,
+        )
+    jobs.attach(job_id, run)
+    jobs.hand_off(job_id, lambda: poll_caption_run(jobs, job_id, run, detail))
+
+# Mirror a running pipeline's progress into the job table. Returns None while it runs, or the job's
+# final (status, error). A live run is stopped before its job fails, and once no player has
+# reported the playhead for a while.
+def poll_caption_run(jobs, job_id, run, detail):
+    progress = run.snapshot()
+    live = isinstance(run, LiveCaptionRun)
+    # A whole-video run keeps going after an error until its consumer finishes; a live run is
+    # stopped here, so the job never ends while its workers still run.
+    if progress["error"] and (progress["done"] or live):
+        if live:
+            run.stop()
+        return "failed", progress["error"]
+    if progress["done"]:
+        jobs.report(job_id, "done", 1.0, detail)
+        return "done", None
+    if live and run.is_idle():
+        run.stop()
+        message = "Live captioning stopped: no player is watching."
+        jobs.report(job_id, "stopped", progress["chunks_done"] / run.chunks_total, message)
+        return "stopped", message
+    total = progress["chunks_total"]
+    stage = "translate" if progress["segments"] else "transcribe"
+    jobs.report(job_id, stage, progress["chunks_done"] / total if total else 0.0, detail)
+    return None
+
+# One job queue per server process, shared by every session.
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    return JobQueue(run_caption_job)
+
+# Queue a captioning job. Jobs are deduplicated by video, caption languages and processing options,
+# so users asking for a video that is already being processed the same way follow the existing job.
+# Live jobs are never shared: each one follows the playhead of the session that started it.
+def submit_caption_job(youtube_url, languages, batch=True, stream=False, live=False, vad=VAD_ENABLED):
+    video_id = extract_video_id(youtube_url) or hashlib.sha1(youtube_url.encode("utf-8")).hexdigest()[:16]
+    payload = {"url": youtube_url, "languages": languages, "batch": batch, "stream": stream, "live": live, "vad": vad}
+    mode = "".join(flag for flag, enabled in [("b", batch), ("s", stream), ("v", vad)] if enabled) or "-"
+    if live:
+        mode = f"live-{uuid.uuid4().hex}"
+    return get_job_queue().submit(f"{video_id}:{prompt_version(languages)}:{mode}", payload)
+
+# Captions ID of a stored result, so each language set and prompt version has its own captions file.
+def stored_captions_id(video_id, languages):
+    return f"{video_id}_{prompt_version(languages)}"
+
+# Queue the stock video once per server process (unless it is already in the result store),
+# so demo visitors are served from the store instead of each waiting for a full run.
+@st.cache_resource(show_spinner=False)
+def prewarm_stock_video():
+    version = prompt_version(TRANSLATION_LANGUAGES)
+    if PREWARM_STOCK_VIDEO and os.getenv("GROQ_API_KEY") and get_result_store().get(extract_video_id(STOCK_VIDEO_URL), version=version) is None:
+        return submit_caption_job(STOCK_VIDEO_URL, TRANSLATION_LANGUAGES)
+    return None
 
 def main():
     st.title("Fast AI Inference -- Real Time Language Translation")
+    prewarm_stock_video()
+    
+    # After a page reload, reattach to the job named in the URL.
+    if st.session_state.get("job_id") is None and st.query_params.get("job"):
+        job = get_job_queue().get(st.query_params["job"])
+        if job is not None:
+            st.session_state["job_id"] = job["job_id"]
+            st.session_state["captions_id"] = job["job_id"]
+            st.session_state["user_youtube_url"] = job["payload"]["url"]
     
     # Move the radio button outside the form so it updates dynamically.
     video_option = st.radio("Select Video Option", options=["Stock Video", "Custom URL"], key="video_option")
@@ -101,8 +252,27 @@ def main():
         if video_option == "Custom URL":
             input_youtube_url = st.text_input("Enter YouTube Video URL:", key="input_youtube_url")
         else:
-            input_youtube_url = "https://www.youtube.com/watch?v=abFz6JgOMCk&list=PLs7zUO7VPyJ5DV1iBRgSw2uDl832n0bLg&index=1"
+            input_youtube_url = STOCK_VIDEO_URL
             st.info("Using Stock Video.")
+        batch_translation = st.checkbox("Batch segments into fewer translation requests", value=True, key="batch_translation")
+        stream_translation = st.checkbox(
+            "Stream translations (show captions while they are generated)", value=False, key="stream_translation",
+            help="Sends one streaming request per segment, so batching is not used.",
+        )
+        languages = st.multiselect(
+            "Caption languages (the first one is shown by default)", options=CAPTION_LANGUAGES,
+            default=[lang for lang in TRANSLATION_LANGUAGES if lang in CAPTION_LANGUAGES], key="caption_languages",
+            help="The audio is transcribed once and translated into every selected language. "
+                 "Streaming produces only the first language.",
+        ) or [DEFAULT_LANGUAGE]
+        skip_silence = st.checkbox(
+            "Skip silence and music before transcription", value=VAD_ENABLED, key="skip_silence",
+            help="Detects speech locally and uploads only the speech regions to Whisper.",
+        )
+        live_mode = st.checkbox(
+            "Live mode (start playing after the first window and caption just ahead of the playhead)",
+            value=False, key="live_mode",
+        )
         submit_url = st.form_submit_button("Prepare Audio")
     
     # Process the URL and prepare audio if the form is submitted.
@@ -112,32 +282,151 @@ def main():
             return
         
         st.session_state["user_youtube_url"] = input_youtube_url
-
-        with st.spinner("Extracting audio from the video..."):
-            audio_file = download_audio(input_youtube_url)
-        st.session_state["audio_file"] = audio_file
-        st.success("Audio extraction successful!")
+        video_id = extract_video_id(input_youtube_url)
+        st.session_state["translated_segments"] = None
+        st.session_state["pipeline_state"] = None
+        st.session_state["player_html"] = None
+        st.session_state["pipeline_run"] = None
+        st.session_state["job_id"] = None
+        st.session_state["captions_id"] = None
         
-        with st.spinner("Transcribing segments..."):
-            result = transcribe_audio(audio_file)
-            segments = result.get("segments", [])
-            translated_segments = []
-            for seg in segments:
-                original_text = seg.get("text", "")
-                translated_text = call_chat_translation(original_text)
-                seg["text"] = translated_text
-                translated_segments.append(seg)
-            st.session_state["translated_segments"] = translated_segments
-        st.success("Transcription complete!")
+        # A video finished before (by any session, or by the startup pre-warm) is served from the result store.
+        stored = get_result_store().get(video_id, version=prompt_version(languages)) if video_id else None
+        if stored is not None:
+            st.session_state["captions_id"] = stored_captions_id(video_id, languages)
+            write_captions(st.session_state["captions_id"], dict(compact_segments(stored), complete=True))
+            st.session_state["translated_segments"] = stored
+            st.session_state["pipeline_state"] = "done"
+            st.query_params.clear()
+            st.success("Loaded saved translations for this video.")
+        else:
+            # Download, transcription and translation run on the background job queue; captions are
+            # published as they are ready, and the job ID in the URL survives page reloads.
+            job_id = submit_caption_job(
+                input_youtube_url, languages, batch_translation, stream_translation, live_mode, skip_silence
+            )
+            st.session_state["job_id"] = job_id
+            st.session_state["captions_id"] = job_id
+            st.query_params["job"] = job_id
     
-    # Show the Play and Translate button once audio and segments are ready.
-    if st.session_state.get("audio_file") is not None and st.session_state.get("translated_segments") is not None:
+    show_pipeline_progress()
+    
+    # In live mode, playback starts on its own as soon as the first window is captioned.
+    run = st.session_state.get("pipeline_run")
+    if isinstance(run, LiveCaptionRun):
+        if st.session_state.get("translated_segments"):
+            show_live_player(run, extract_video_id(st.session_state["user_youtube_url"]))
+    # Show the Play and Translate button as soon as the first translated segments are ready.
+    elif st.session_state.get("translated_segments"):
         if st.button("Play and Translate"):
-            segments_json = json.dumps(st.session_state["translated_segments"])
-            video_id = extract_video_id(st.session_state["user_youtube_url"])
-            html_code = f"""
+            # Keep the player HTML fixed so progress reruns do not reload the video.
+            st.session_state["player_html"] = build_player_html(
+                extract_video_id(st.session_state["user_youtube_url"]),
+                st.session_state["captions_id"],
+                st.session_state["translated_segments"],
+                st.session_state.get("pipeline_state") == "done",
+            )
+        if st.session_state.get("player_html"):
+            st.components.v1.html(st.session_state["player_html"], height=500, scrolling=False)
+    
+    # Per-stage latency, bytes and token metrics for this server process, with exports.
+    render_metrics_panel(st)
+
+# Show pipeline progress, refreshing every couple of seconds without rerunning the whole page.
+# A full rerun is triggered only when the first captions arrive and when the job finishes.
+@st.fragment(run_every=2)
+def show_pipeline_progress():
+    job_id = st.session_state.get("job_id")
+    job = get_job_queue().get(job_id) if job_id else None
+    if job is None:
+        return
+    run = get_job_queue().attachment(job_id)
+    st.session_state["pipeline_run"] = run
+    if run is None or job["status"] == "stopped":
+        show_job_status(job)
+        return
+    if job["detail"]:
+        st.caption(job["detail"])
+    progress = run.snapshot()
+    st.session_state["translated_segments"] = progress["segments"]
+    segments = progress["segments"]
+    
+    if progress["error"]:
+        st.error(f"Processing failed: {progress['error']}")
+    if progress["done"]:
+        state = "done"
+        if progress["failures"]:
+            # Multi-language runs report one failure per language, so count segments once.
+            failed = len({failure["index"] for failure in progress["failures"]})
+            st.warning(f"{failed} of {len(segments)} segments could not be translated into every language; those captions are shown untranslated.")
+        st.success("Transcription complete!")
+        cache_stats = get_translation_cache().stats()
+        st.caption(f"Translation cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} entries.")
+    else:
+        state = "running" if segments else "waiting"
+        total = progress["chunks_total"]
+        fraction = progress["chunks_done"] / total if total else 0.0
+        if isinstance(run, LiveCaptionRun):
+            st.progress(fraction, text=f"Live captions: {progress['chunks_done']} of {total} windows ready, "
+                                       f"working up to {run.lookahead_seconds:.0f}s past the playhead ({run.playhead:.0f}s).")
+        else:
+            st.progress(fraction, text=f"Transcribing and translating... {len(segments)} segments ready.")
+        if progress["streaming"]:
+            st.caption(f"Translating: {progress['streaming'][-1]}…")
+    
+    if state != st.session_state.get("pipeline_state"):
+        st.session_state["pipeline_state"] = state
+        if state != "waiting":
+            st.rerun()
+
+# Show the status of a job with no pipeline in this process yet: queued, downloading, stopped, or
+# finished by an earlier server process (its result then comes from the result store).
+def show_job_status(job):
+    if job["status"] == "failed":
+        st.error(f"Processing failed: {job['error']}")
+        state = "failed"
+    elif job["status"] == "stopped":
+        st.info(f"{job['error']} Submit the video again to resume.")
+        state = "stopped"
+    elif job["status"] == "done":
+        video_id, languages = extract_video_id(job["payload"]["url"]), job["payload"]["languages"]
+        stored = get_result_store().get(video_id, version=prompt_version(languages))
+        if stored is not None:
+            st.session_state["captions_id"] = stored_captions_id(video_id, languages)
+            write_captions(st.session_state["captions_id"], dict(compact_segments(stored), complete=True))
+            st.session_state["translated_segments"] = stored
+            st.success("Transcription complete!")
+        else:
+            st.warning("This job finished earlier with untranslated segments; submit the video again to retry.")
+        state = "done"
+    else:
+        st.progress(job["progress"], text=job["detail"] or "Waiting for a worker...")
+        state = "waiting"
+    if state != st.session_state.get("pipeline_state"):
+        st.session_state["pipeline_state"] = state
+        if state != "waiting":
+            st.rerun()
+
+# Show the live player; each playhead report reruns only this fragment and re-prioritizes the run.
+@st.fragment
+def show_live_player(run, video_id):
+    value = live_player(
+        video_id=video_id, captions_url=captions_url(run.captions_id), key=f"live_player_{run.captions_id}", default=None,
+    )
+    if value:
+        run.set_playhead(value["time"])
+
+# Build the embedded YouTube player with translated captions.
+# Captions are sent as compact start/end/text arrays and looked up with the shared CaptionLookup
+# (a moving cursor plus binary search) on every animation frame; the caption element is only touched
+# when it changes. While processing is still running, the player polls the published captions file
+# (named by captions_id) for new segments, more often while streamed captions are still partial.
+def build_player_html(video_id, captions_id, segments, complete):
+    captions_json = json.dumps(compact_segments(segments), separators=(",", ":")).replace("</", "<\\/")
+    return f"""
             <html>
               <head>
+                <script>{CAPTION_LOOKUP_JS}</script>
                 <script>
                   // Load the YouTube IFrame API code asynchronously.
                   var tag = document.createElement('script');
@@ -146,8 +435,13 @@ def main():
                   firstScriptTag.parentNode.insertBefore(tag, firstScriptTag);
 
                   var player;
-                  // The translated transcription segments passed from Python.
-                  var segments = {segments_json};
+                  // The translated transcription segments passed from Python, sorted by start time.
+                  var lookup = new CaptionLookup({captions_json});
+                  // Index of the caption currently shown (-1 for none).
+                  var shownIndex = -1;
+                  // Segments still being translated are fetched from the captions file.
+                  var captionsUrl = "{captions_url(captions_id)}";
+                  var captionsComplete = {json.dumps(complete)};
 
                   function onYouTubeIframeAPIReady() {{
                     player = new YT.Player('player', {{
@@ -161,30 +455,59 @@ def main():
                         rel: 0
                       }},
                       events: {{
-                        'onReady': onPlayerReady
+                        'onReady': onPlayerReady,
+                        'onStateChange': updateCaption
                       }}
                     }});
                   }}
 
+                  function selectTrack(language) {{
+                    lookup.track = language;
+                    shownIndex = -2;  // Redraw the current caption in the new language.
+                  }}
+
                   function onPlayerReady(event) {{
                     // Automatically start the video.
                     event.target.playVideo();
-                    setInterval(checkCaption, 500);
+                    lookup.updateTrackMenu(document.getElementById("track"));
+                    requestAnimationFrame(tick);
+                    refreshSegments();
                   }}
 
-                  function checkCaption() {{
-                    if (player && player.getCurrentTime) {{
-                      var currentTime = player.getCurrentTime();
-                      var captionText = "";
-                      // Iterate over the segments and display the matching translation.
-                      for (var i = 0; i < segments.length; i++) {{
-                        var seg = segments[i];
-                        if (currentTime >= seg.start && currentTime <= seg.end) {{
-                          captionText = seg.text;
-                          break;
+                  function tick() {{
+                    updateCaption();
+                    requestAnimationFrame(tick);
+                  }}
+
+                  function refreshSegments() {{
+                    if (captionsComplete) {{
+                      return;
+                    }}
+                    fetch(captionsUrl + "?t=" + Date.now())
+                      .then(function(response) {{ return response.json(); }})
+                      .then(function(data) {{
+                        if (data.texts.length >= lookup.captions.texts.length) {{
+                          lookup.setCaptions(data);
+                          shownIndex = -2;  // Force a redraw with the new data.
+                          lookup.updateTrackMenu(document.getElementById("track"));
                         }}
+                        captionsComplete = data.complete;
+                      }})
+                      .catch(function() {{}})
+                      .then(function() {{ setTimeout(refreshSegments, lookup.captions.partial ? 500 : 2000); }});
+                  }}
+
+                  function updateCaption() {{
+                    if (player && player.getCurrentTime) {{
+                      var index = lookup.find(player.getCurrentTime());
+                      if (index !== shownIndex) {{
+                        shownIndex = index;
+                        var element = document.getElementById("captions");
+                        // Streamed captions that are still being translated are dimmed.
+                        var partial = lookup.isPartial(index);
+                        element.textContent = index >= 0 ? lookup.text(index) + (partial ? "…" : "") : "";
+                        element.style.opacity = partial ? "0.6" : "1";
                       }}
-                      document.getElementById("captions").innerHTML = captionText;
                     }}
                   }}
                 </script>
@@ -192,18 +515,24 @@ def main():
               <body style="background-color: #121212; color: white; text-align: center;">
                 <div id="player"></div>
                 <div id="captions" style="font-size:20px; margin-top:10px; font-weight:bold;"></div>
+                <select id="track" style="display:none; margin-top:10px;" onchange="selectTrack(this.value)"></select>
               </body>
             </html>
             """
-            st.components.v1.html(html_code, height=500, scrolling=False)
 
 # Initialize session state keys before calling main().
 if "user_youtube_url" not in st.session_state:
     st.session_state["user_youtube_url"] = ""
-if "audio_file" not in st.session_state:
-    st.session_state["audio_file"] = None
 if "translated_segments" not in st.session_state:
     st.session_state["translated_segments"] = None
+if "pipeline_run" not in st.session_state:
+    st.session_state["pipeline_run"] = None
+if "player_html" not in st.session_state:
+    st.session_state["player_html"] = None
+if "job_id" not in st.session_state:
+    st.session_state["job_id"] = None
+if "captions_id" not in st.session_state:
+    st.session_state["captions_id"] = None
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import base64
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from metrics import percentile
+
+# Upper bound on the frames packed into one vision request.
+MAX_FRAMES_PER_REQUEST = int(os.getenv("VISION_MAX_FRAMES_PER_REQUEST", "8"))
+
+BATCH_FRAME_PROMPT_TEMPLATE = (
+    "You will receive {count} video frames, each preceded by its number. "
+    "Answer for every frame independently, following this instruction: {prompt}\n"
+    'Respond with only a JSON object of the form {{"frames": [{{"id": 1, "description": "..."}}]}} '
+    "containing exactly one entry per frame, in order."
+)
+
+def image_part(jpeg):
+    base64_image = base64.b64encode(jpeg).decode("utf-8")
+    return {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+
+def build_frame_messages(jpegs, prompt):
+    """
+    Chat messages asking about one or more JPEG frames. A single frame gets the plain prompt;
+    several frames are numbered and the model is asked for one JSON answer per frame.
+    """
+    if len(jpegs) == 1:
+        content = [{"type": "text", "text": prompt}, image_part(jpegs[0])]
+    else:
+        content = [{"type": "text", "text": BATCH_FRAME_PROMPT_TEMPLATE.format(count=len(jpegs), prompt=prompt)}]
+        for i, jpeg in enumerate(jpegs, start=1):
+            content.append({"type": "text", "text": f"Frame {i}:"})
+            content.append(image_part(jpeg))
+    return [{"role": "user", "content": content}]
+
+def parse_frame_response(content, expected_count):
+    """Parses a multi-frame response into {id: description}, skipping anything malformed."""
+    if not isinstance(content, str):
+        return {}
+    # Tolerate a code fence or a sentence around the JSON object.
+    start, end = content.find("{"), content.rfind("}")
+    try:
+        data = json.loads(content[start:end + 1] if start >= 0 else content)
+    except ValueError:
+        return {}
+    items = data.get("frames") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return {}
+    results = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            item_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        description = item.get("description")
+        if 1 <= item_id <= expected_count and isinstance(description, str) and description.strip():
+            results[item_id] = description.strip()
+    return results
+
+def frame_answers(content, count):
+    """Maps a response back to a list with one answer per frame (None where one is missing)."""
+    if count == 1:
+        return [content]
+    answers = parse_frame_response(content, count)
+    return [answers.get(i) for i in range(1, count + 1)]
+
+def run_vision_benchmark(jpegs, request_fn, models, batch_sizes, max_workers=4):
+    """
+    Sends the same frames through every model at every batch size and returns one row per
+    combination with request and per-frame latency percentiles and frame throughput.
+    request_fn(model, jpegs) makes one request and returns (frame_answers() list, round-trip seconds, ...).
+    Requests of a combination run concurrently on max_workers threads, like the app does.
+    Latency columns are None when every request of a combination failed.
+    """
+    rows = []
+    for model in models:
+        for batch_size in batch_sizes:
+            batches = [jpegs[i:i + batch_size] for i in range(0, len(jpegs), batch_size)]
+            latencies = []
+            frame_latencies = []
+            errors = 0
+            answered = 0
+            wall_start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(request_fn, model, batch): batch for batch in batches}
+                for future in as_completed(futures):
+                    try:
+                        answers, latency = future.result()[:2]
+                    except Exception:
+                        errors += 1
+                        continue
+                    latencies.append(latency)
+                    # The last batch may be smaller, so divide by its own length.
+                    frame_latencies.append(latency / len(futures[future]))
+                    answered += sum(1 for answer in answers if answer)
+            wall_time = time.perf_counter() - wall_start
+
+            rows.append({
+                "model": model,
+                "frames_per_request": batch_size,
+                "requests": len(batches),
+                "errors": errors,
+                "frames_answered": f"{answered}/{len(jpegs)}",
+                "p50_request_s": round(percentile(latencies, 50), 3) if latencies else None,
+                "p95_request_s": round(percentile(latencies, 95), 3) if latencies else None,
+                "p50_per_frame_s": round(percentile(frame_latencies, 50), 3) if frame_latencies else None,
+                "wall_s": round(wall_time, 3),
+                "frames_per_s": round(answered / wall_time, 2) if wall_time > 0 else 0.0,
+            })
+    return rows
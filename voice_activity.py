@@ -0,0 +1,192 @@
+import os
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+from metrics import timed
+
+try:
+    import webrtcvad  # Optional: a trained detector that also rejects most music and noise.
+except ImportError:
+    webrtcvad = None
+
+# Audio is analysed as 16 kHz mono in frames of this length (10, 20 or 30 ms for webrtcvad).
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+# Whether the apps trim non-speech audio before transcription by default.
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") != "0"
+# webrtcvad aggressiveness, 0 (keeps most audio) to 3 (drops most non-speech).
+VAD_AGGRESSIVENESS = int(os.getenv("VAD_AGGRESSIVENESS", "2"))
+# Energy detector: frames this many dB above the noise floor count as speech.
+ENERGY_MARGIN_DB = float(os.getenv("VAD_ENERGY_MARGIN_DB", "12"))
+# ... and frames louder than this (dB relative to one int16 step; full scale is about 90) always do.
+ENERGY_SPEECH_DB = float(os.getenv("VAD_ENERGY_SPEECH_DB", "45"))
+# Pauses shorter than this stay inside a speech region.
+MIN_SILENCE_SECONDS = float(os.getenv("VAD_MIN_SILENCE_SECONDS", "0.8"))
+# Speech regions shorter than this are dropped as clicks and noise.
+MIN_SPEECH_SECONDS = float(os.getenv("VAD_MIN_SPEECH_SECONDS", "0.25"))
+# Kept around every region so word onsets and endings are not clipped.
+PADDING_SECONDS = float(os.getenv("VAD_PADDING_SECONDS", "0.2"))
+# Audio is sent untrimmed unless trimming removes at least this fraction of it.
+MIN_SAVINGS = float(os.getenv("VAD_MIN_SAVINGS", "0.1"))
+
+def _iter_frames(path, frame_samples):
+    """Decodes path with ffmpeg and yields consecutive int16 frames of frame_samples samples."""
+    process = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", path, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"],
+        stdout=subprocess.PIPE
+    )
+    frame_bytes = frame_samples * 2
+    buffer = b""
+    try:
+        while True:
+            block = process.stdout.read(frame_bytes * 512)
+            if not block:
+                break
+            buffer += block
+            usable = len(buffer) - len(buffer) % frame_bytes
+            for offset in range(0, usable, frame_bytes):
+                yield np.frombuffer(buffer[offset:offset + frame_bytes], dtype=np.int16)
+            buffer = buffer[usable:]
+    finally:
+        process.stdout.close()
+        process.wait()
+
+def speech_flags(frames):
+    """
+    Returns one boolean per frame: webrtcvad's decision when available, else an energy threshold
+    relative to the noise floor (which drops silence and quiet beds but keeps loud music).
+    """
+    if webrtcvad is not None:
+        vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+        return [vad.is_speech(frame.tobytes(), SAMPLE_RATE) for frame in frames]
+    levels = np.array([
+        10 * np.log10(np.mean(frame.astype(np.float64) ** 2) + 1.0) for frame in frames
+    ])
+    if not len(levels):
+        return []
+    # The quietest tenth of the audio approximates the noise floor.
+    threshold = min(np.percentile(levels, 10) + ENERGY_MARGIN_DB, ENERGY_SPEECH_DB)
+    return list(levels > threshold)
+
+def flags_to_regions(flags, frame_seconds=FRAME_SECONDS, min_silence=MIN_SILENCE_SECONDS,
+                     min_speech=MIN_SPEECH_SECONDS, padding=PADDING_SECONDS):
+    """
+    Turns per-frame speech flags into padded, merged (start, end) regions in seconds.
+    Bounds fall on frame boundaries, so extract_speech writes exactly end - start of each region.
+    """
+    min_silence_frames = int(round(min_silence / frame_seconds))
+    min_speech_frames = int(round(min_speech / frame_seconds))
+    padding_frames = int(round(padding / frame_seconds))
+    raw = []
+    start = None
+    for i, is_speech in enumerate(list(flags) + [False]):
+        if is_speech and start is None:
+            start = i
+        elif not is_speech and start is not None:
+            raw.append((start, i))
+            start = None
+    regions = []
+    for start, end in raw:
+        if regions and start - regions[-1][1] < min_silence_frames:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    padded = []
+    for start, end in regions:
+        if end - start < min_speech_frames:
+            continue
+        start, end = max(0, start - padding_frames), min(len(flags), end + padding_frames)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return [(round(start * frame_seconds, 3), round(end * frame_seconds, 3)) for start, end in padded]
+
+def detect_speech_regions(path):
+    """Returns (regions, duration): the speech regions of path in seconds and its decoded duration."""
+    frame_samples = int(SAMPLE_RATE * FRAME_SECONDS)
+    flags = speech_flags(_iter_frames(path, frame_samples))
+    return flags_to_regions(flags), len(flags) * FRAME_SECONDS
+
+def extract_speech(path, regions, output_path):
+    """
+    Writes only the speech regions of path, back to back, as compact mono speech audio.
+    Returns the number of seconds written.
+    """
+    frame_samples = int(SAMPLE_RATE * FRAME_SECONDS)
+    # Region bounds are frame-aligned (see flags_to_regions); compare whole frame indices.
+    frame_regions = [(int(round(start / FRAME_SECONDS)), int(round(end / FRAME_SECONDS))) for start, end in regions]
+    encoder = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-y", "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-i", "-",
+         "-c:a", "libmp3lame", "-b:a", "32k", "-f", "mp3", output_path],
+        stdin=subprocess.PIPE
+    )
+    written = 0
+    try:
+        region = 0
+        for i, frame in enumerate(_iter_frames(path, frame_samples)):
+            while region < len(frame_regions) and i >= frame_regions[region][1]:
+                region += 1
+            if region == len(frame_regions):
+                break
+            if i >= frame_regions[region][0]:
+                encoder.stdin.write(frame.tobytes())
+                written += 1
+    finally:
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to write the speech-only audio for '{path}'.")
+    return written * FRAME_SECONDS
+
+def to_original_time(t, regions, prefer_end=False):
+    """
+    Maps a time in the speech-only audio back to the original audio. A time exactly at the
+    joint between two regions maps to the end of the earlier one when prefer_end is set.
+    """
+    elapsed = 0.0
+    for start, end in regions:
+        length = end - start
+        if t < elapsed + length or (prefer_end and t <= elapsed + length):
+            return round(start + max(0.0, t - elapsed), 2)
+        elapsed += length
+    return round(regions[-1][1], 2) if regions else round(t, 2)
+
+def with_voice_activity_detection(transcribe_fn, min_savings=MIN_SAVINGS):
+    """
+    Wraps transcribe_fn(path, assumed_duration) so that only the speech regions of the audio
+    are uploaded. Returned segment timestamps are mapped back to the original audio, so callers
+    (including chunked transcription) see no difference. Audio where trimming would save less
+    than min_savings, where no speech is found, or where ffmpeg is unavailable is passed through
+    unchanged.
+    """
+    def transcribe(path, assumed_duration=None):
+        def passthrough():
+            return transcribe_fn(path) if assumed_duration is None else transcribe_fn(path, assumed_duration)
+
+        if shutil.which("ffmpeg") is None:
+            return passthrough()
+        with timed("voice_activity") as span:
+            regions, duration = detect_speech_regions(path)
+            span.bytes = os.path.getsize(path)
+        speech_seconds = sum(end - start for start, end in regions)
+        if not regions or not duration or 1 - speech_seconds / duration < min_savings:
+            return passthrough()
+
+        fd, speech_path = tempfile.mkstemp(suffix=".mp3")
+        os.close(fd)
+        try:
+            written_seconds = extract_speech(path, regions, speech_path)
+            # Timestamps are mapped back assuming every region was written in full.
+            if abs(written_seconds - speech_seconds) > FRAME_SECONDS / 2:
+                return passthrough()
+            result = transcribe_fn(speech_path, speech_seconds)
+        finally:
+            os.remove(speech_path)
+        segments = [
+            dict(seg, start=to_original_time(seg.get("start", 0.0), regions),
+                 end=to_original_time(seg.get("end", 0.0), regions, prefer_end=True))
+            for seg in result.get("segments", [])
+        ]
+        return dict(result, segments=segments)
+    return transcribe